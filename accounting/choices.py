@@ -0,0 +1,160 @@
+"""
+کش لیست گزینه‌های dropdown فرم‌های حسابداری.
+
+Each list is cached under its name and a version number. Saving or deleting
+a row of any model the list is built from bumps the version once the
+transaction commits, so the next render rebuilds the list with one query and
+every later render reads it from the cache. Versions are kept in the same
+cache, so with the shared file backend (``CACHES`` in settings) a bump made
+by one worker is seen by all of them.
+
+Lists too long for a ``<select>`` are served by ``CachedAutocompleteView``
+instead, whose result pages are cached under the same versions.
+
+Writes that skip signals (``bulk_create``, ``QuerySet.update``) do not bump
+the version; ``CHOICES_CACHE_TIMEOUT`` bounds how long such a list stays
+stale, and ``invalidate()`` can be called after them explicitly.
+"""
+import hashlib
+import time
+
+from dal import autocomplete
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.forms.models import ModelChoiceField, ModelChoiceIterator
+from django.http import HttpResponse
+
+# نام هر لیست -> مدل‌هایی که تغییرشان لیست را باطل می‌کند.
+DEPENDENCIES = {
+    'active_cars': ('core.Car', 'core.RepairJob'),
+    'repair_jobs': ('core.Car', 'core.RepairJob'),
+    'item_names': ('core.ItemName',),
+    'employees': ('accounting.Employee',),
+    'expense_categories': ('accounting.ExpenseCategory',),
+    'staff_users': (settings.AUTH_USER_MODEL,),
+}
+
+
+def _version_key(name):
+    return f'choices:{name}:version'
+
+
+def version(name):
+    # A counter lost from the cache restarts from the clock, never from a
+    # number an older list may still be stored under.
+    return cache.get_or_set(_version_key(name), time.time_ns(), timeout=None)
+
+
+def invalidate(*names):
+    """Bumps the version of the given lists, or of every list."""
+    for name in names or DEPENDENCIES:
+        try:
+            cache.incr(_version_key(name))
+        except ValueError:
+            version(name)
+
+
+def get_cached(name, build, variant=''):
+    """``build()``'s result for the list's current version, built on a miss."""
+    key = f'choices:{name}:{version(name)}:{variant}'
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, settings.CHOICES_CACHE_TIMEOUT)
+    return value
+
+
+def get_choices(name, build):
+    """``build()``'s ``(value, label)`` pairs for the list's current version."""
+    return get_cached(name, lambda: list(build()))
+
+
+class CachedChoiceIterator(ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        yield from self.field.cached_choices()
+
+    def __len__(self):
+        return len(self.field.cached_choices()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.cached_choices())
+
+
+class CachedModelChoiceField(ModelChoiceField):
+    """
+    ModelChoiceField whose options are rendered from the cached list
+    ``cache_name``; submitted values are still validated against the queryset.
+    """
+    iterator = CachedChoiceIterator
+
+    def __init__(self, queryset, *, cache_name, **kwargs):
+        self.cache_name = cache_name
+        super().__init__(queryset, **kwargs)
+
+    def cached_choices(self):
+        return get_choices(
+            self.cache_name,
+            lambda: [(obj.pk, self.label_from_instance(obj)) for obj in self.queryset],
+        )
+
+
+class CachedAutocompleteView(LoginRequiredMixin, autocomplete.Select2QuerySetView):
+    """
+    Select2 autocomplete over a list too long for a ``<select>``. Each page
+    holds at most ``paginate_by`` results, and the JSON of every
+    (term, page) is cached under the version of list ``cache_name``, so
+    retyping a term costs no queries until the list changes.
+    """
+    cache_name = None
+    paginate_by = 20
+
+    def get(self, request, *args, **kwargs):
+        render = super().get
+        variant = hashlib.sha256(request.GET.urlencode().encode()).hexdigest()
+        content = get_cached(self.cache_name, lambda: render(request, *args, **kwargs).content, variant)
+        return HttpResponse(content, content_type='application/json')
+
+
+class _Invalidation:
+    """One on_commit callback that bumps every list changed in the transaction."""
+
+    def __init__(self):
+        self.names = set()
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        invalidate(*self.names)
+
+
+def _changed(sender, **kwargs):
+    names = [name for name, labels in DEPENDENCIES.items() if sender._meta.label in labels]
+    # پس از commit، تا درخواست دیگری لیست را از داده‌های قدیمی دوباره نسازد.
+    # A bulk delete sends a signal per row; they share the pending callback
+    # unless it belongs to a savepoint that may still roll back without them.
+    connection = transaction.get_connection()
+    if connection.in_atomic_block and connection.run_on_commit:
+        savepoints, callback, _ = connection.run_on_commit[-1]
+        if (
+            isinstance(callback, _Invalidation) and not callback.done
+            and set(savepoints) <= set(connection.savepoint_ids)
+        ):
+            callback.names.update(names)
+            return
+    callback = _Invalidation()
+    callback.names.update(names)
+    transaction.on_commit(callback)
+
+
+def connect_signals():
+    labels = {label for labels in DEPENDENCIES.values() for label in labels}
+    for label in labels:
+        model = apps.get_model(label)
+        post_save.connect(_changed, sender=model, dispatch_uid=f'choices_save_{label}')
+        post_delete.connect(_changed, sender=model, dispatch_uid=f'choices_delete_{label}')
@@ -1,15 +1,43 @@
+from dal import autocomplete
 from django import forms
 from .models import Income, Expense, Attendance, ExpenseCategory, SalarySlip, Employee
+from .choices import CachedModelChoiceField
 from django.contrib.auth.models import User
-from core.models import  Car, Part
+from core.models import  Car, Part, RepairJob
 from django.db.models import Q
 from accounting.models import Employee
+# کارهایی که هنوز ممکن است برایشان قطعه خریده شود.
+PURCHASE_STATUSES = [
+    'pending_expert', 'quotation', 'pending_approval', 'pending_start', 'pending_part',
+    'working', 'ready_exit', 'sign', 'exit', 'paid'
+]
+
+
+def purchasable_cars():
+    return Car.objects.filter(jobs__status__in=PURCHASE_STATUSES).distinct()
+
+
 class IncomeForm(forms.ModelForm):
+    # لیست همه کارها رندر نمی‌شود؛ کار با جستجو (autocomplete) انتخاب می‌شود.
+    repair_job = forms.ModelChoiceField(
+        queryset=RepairJob.objects.select_related('car'),
+        required=False,
+        label="Related Repair Job",
+        widget=autocomplete.ModelSelect2(
+            url='accounting:repair_job_autocomplete',
+            # داخل modal داشبورد باز می‌شود تا فوکوس جستجو از modal بیرون نرود.
+            attrs={
+                'data-placeholder': 'Search plate, claim or job #',
+                'data-allow-clear': 'true',
+                'data-dropdown-parent': '#incomeModal',
+            },
+        ),
+    )
+
     class Meta:
         model = Income
         fields = ['repair_job', 'source', 'description', 'amount']
         widgets = {
-            'repair_job': forms.Select(attrs={'class': 'form-control'}),
             'source': forms.TextInput(attrs={'class': 'form-control'}),
             'description': forms.Textarea(attrs={'rows': 2, 'class': 'form-control', 'placeholder': 'Description'}),
             'amount': forms.NumberInput(attrs={'class': 'form-control'}),
@@ -33,6 +61,7 @@ class SalarySlipForm(forms.ModelForm):
             'extra_h', 'mines_h', 'extra', 'mines', 'description'
         ]
         widgets = {
+            'employee': autocomplete.ModelSelect2(url='accounting:employee_autocomplete'),
             'pay_period_start': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
             'pay_period_end': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
         }
@@ -47,7 +76,7 @@ class SalarySlipForm(forms.ModelForm):
 class AttendanceForm(forms.ModelForm):
     employee = forms.ModelChoiceField(
         queryset=Employee.objects.all().order_by('full_name'),
-        widget=forms.Select(attrs={'class': 'form-select'})
+        widget=autocomplete.ModelSelect2(url='accounting:employee_autocomplete', attrs={'class': 'form-select'})
     )
 
     class Meta:
@@ -77,13 +106,11 @@ class ExpenseTypeForm(forms.ModelForm):
 
 class BuyPartForm(forms.Form):
     car = forms.ModelChoiceField(
-        queryset=Car.objects.filter(jobs__status__in=[
-            'pending_expert', 'quotation', 'pending_approval', 'pending_start', 'pending_part',
-            'working', 'ready_exit', 'sign', 'exit', 'paid'
-        ]).distinct(),
-        widget=forms.Select(attrs={
+        queryset=purchasable_cars(),
+        widget=autocomplete.ModelSelect2(url='accounting:car_autocomplete', attrs={
             'class': 'form-control',
-            'placeholder': 'Select Car'
+            'data-placeholder': 'Search plate',
+            'data-dropdown-parent': '#buyPartModal',
         }),
         label="Car"
     )
@@ -134,8 +161,9 @@ class SimpleExpenseForm(forms.Form):
         label="Expense Type"
     )
     
-    category = forms.ModelChoiceField(
+    category = CachedModelChoiceField(
         queryset=ExpenseCategory.objects.all(), 
+        cache_name='expense_categories',
         required=False, 
         label="Garage Category"
     )
@@ -162,11 +190,16 @@ class SimpleExpenseForm(forms.Form):
     employee = forms.ModelChoiceField(
         queryset=Employee.objects.all().order_by('full_name'), 
         required=False,
-        label="Employee"
+        label="Employee",
+        widget=autocomplete.ModelSelect2(
+            url='accounting:employee_autocomplete',
+            attrs={'data-placeholder': 'Search employee', 'data-dropdown-parent': '#expenseModal'},
+        ),
     )
     
-    recorded_by = forms.ModelChoiceField(
+    recorded_by = CachedModelChoiceField(
         queryset=User.objects.filter(is_staff=True),
+        cache_name='staff_users',
         required=False,
         label="Recorded By"
     )
@@ -0,0 +1,108 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import CharField, Value
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Income, Expense
+
+# Relations followed when a ledger row is rendered or exported. Loading them
+# with the row keeps a page (or an export chunk) at a constant query count.
+INCOME_RELATED = ('repair_job__car', 'recorded_by')
+EXPENSE_RELATED = ('related_part__repair_job__car', 'category', 'recorded_by')
+
+
+def ledger_filters(params):
+    """Reads the ledger filters shared by the dashboard and the Excel export."""
+    return {
+        'type_filter': params.get('type'),
+        'from_date': params.get('from'),
+        'to_date': params.get('to'),
+    }
+
+
+def _day_start(value):
+    try:
+        day = parse_date(value or '')
+    except ValueError:
+        return None
+    if day is None:
+        return None
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def date_range(from_date=None, to_date=None, field='transaction_date'):
+    """
+    Turns the ``from``/``to`` day filters into lookups on ``field``.
+
+    ``field__date__gte`` wraps the column in a cast, so the database can't use
+    the index on it. Comparing against the start of the first day and the
+    start of the day after ``to_date`` is the same filter as a plain range
+    scan. Dates that don't parse are ignored.
+    """
+    lookups = {}
+    start = _day_start(from_date)
+    if start:
+        lookups[f'{field}__gte'] = start
+    end = _day_start(to_date)
+    if end:
+        lookups[f'{field}__lt'] = end + timedelta(days=1)
+    return lookups
+
+
+def ledger_rows(type_filter=None, from_date=None, to_date=None):
+    """
+    Builds one UNION ALL query over Income and Expense.
+
+    Every row only carries ``kind``, ``id`` and ``transaction_date`` so the
+    database can sort, count and slice the whole ledger. Use ``hydrate`` to
+    turn the rows of a single page back into model instances.
+    """
+    dates = date_range(from_date, to_date)
+    incomes = Income.objects.filter(**dates)
+    expenses = Expense.objects.filter(**dates)
+
+    income_rows = incomes.order_by().annotate(
+        kind=Value('income', output_field=CharField())
+    ).values('kind', 'id', 'transaction_date')
+    expense_rows = expenses.order_by().annotate(
+        kind=Value('expense', output_field=CharField())
+    ).values('kind', 'id', 'transaction_date')
+
+    if type_filter == 'income':
+        rows = income_rows
+    elif type_filter == 'expense':
+        rows = expense_rows
+    else:
+        rows = income_rows.union(expense_rows, all=True)
+
+    return rows.order_by('-transaction_date', '-id')
+
+
+def hydrate(rows):
+    """Loads the Income/Expense objects behind ledger rows, keeping their order."""
+    rows = list(rows)
+    income_ids = [row['id'] for row in rows if row['kind'] == 'income']
+    expense_ids = [row['id'] for row in rows if row['kind'] == 'expense']
+
+    objects = {
+        'income': Income.objects.select_related(*INCOME_RELATED).in_bulk(income_ids) if income_ids else {},
+        'expense': Expense.objects.select_related(*EXPENSE_RELATED).in_bulk(expense_ids) if expense_ids else {},
+    }
+    return [
+        objects[row['kind']][row['id']]
+        for row in rows
+        if row['id'] in objects[row['kind']]
+    ]
+
+
+def iter_transactions(rows, chunk_size=500):
+    """Streams ledger rows as model instances, hydrating one chunk at a time."""
+    chunk = []
+    for row in rows.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield from hydrate(chunk)
+            chunk = []
+    if chunk:
+        yield from hydrate(chunk)
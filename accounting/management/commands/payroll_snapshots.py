@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from accounting.models import SalarySlip
+
+SNAPSHOT_FIELDS = ['closed_absence_days', 'closed_absence_deduction', 'closed_cost', 'closed_rest']
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfills the stored totals of closed salary slips and verifies them "
+        "against a live recomputation from attendance and slip rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help="Only compare stored snapshots with live totals; exit with an error on mismatch.",
+        )
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help="Recompute the snapshot of every closed slip, not only the missing ones.",
+        )
+
+    def handle(self, *args, **options):
+        slips = SalarySlip.objects.select_related('employee').with_totals().filter(is_closed=True)
+
+        if options['verify']:
+            self.verify(slips)
+            return
+
+        if not options['rebuild']:
+            slips = slips.filter(closed_rest__isnull=True)
+
+        to_update = []
+        for slip in slips.iterator(chunk_size=500):
+            slip.clear_snapshot()
+            slip.freeze_totals()
+            to_update.append(slip)
+
+        with transaction.atomic():
+            SalarySlip.objects.bulk_update(to_update, SNAPSHOT_FIELDS, batch_size=500)
+        self.stdout.write(self.style.SUCCESS(f"Stored totals for {len(to_update)} closed salary slip(s)."))
+
+    def verify(self, slips):
+        checked = 0
+        mismatches = 0
+        for slip in slips.iterator(chunk_size=500):
+            checked += 1
+            if not slip.has_snapshot:
+                mismatches += 1
+                self.stdout.write(self.style.WARNING(f"#{slip.id} {slip}: no stored totals"))
+                continue
+
+            live = {
+                'closed_absence_days': slip.absence_count,
+                'closed_absence_deduction': round(slip.annotated_absence_deduction, 2),
+                'closed_cost': round(slip.annotated_balance, 2),
+                'closed_rest': round(slip.annotated_balance, 2),
+            }
+            for field, value in live.items():
+                stored = getattr(slip, field)
+                if stored != value:
+                    mismatches += 1
+                    self.stdout.write(self.style.WARNING(
+                        f"#{slip.id} {slip}: {field} stored={stored} live={value}"
+                    ))
+
+        if mismatches:
+            raise CommandError(f"{mismatches} mismatch(es) in {checked} closed salary slip(s).")
+        self.stdout.write(self.style.SUCCESS(f"All {checked} closed salary slip(s) match their live totals."))
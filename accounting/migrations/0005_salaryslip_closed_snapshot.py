@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 00:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0004_salaryslip_is_closed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salaryslip',
+            name='closed_absence_days',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='salaryslip',
+            name='closed_absence_deduction',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='salaryslip',
+            name='closed_cost',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='salaryslip',
+            name='closed_rest',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-18 00:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0005_salaryslip_closed_snapshot'),
+        ('core', '0010_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['transaction_date', 'id'], name='acc_expense_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['employee', 'expense_type', 'transaction_date'], name='acc_expense_employee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='income',
+            index=models.Index(fields=['transaction_date', 'id'], name='acc_income_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salaryslip',
+            index=models.Index(fields=['employee', 'pay_period_end'], name='acc_slip_employee_end_idx'),
+        ),
+    ]
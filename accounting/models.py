@@ -1,6 +1,8 @@
-from django.db import models
+from django.contrib.postgres.indexes import BTreeIndex, OpClass
+from django.db import models, transaction
+from django.db.models.functions import Upper
 from django.conf import settings
-from core.models import RepairJob 
+from core.models import Car, RepairJob
 from django.utils import timezone
 class ExpenseCategory(models.Model):
     name = models.CharField(max_length=100, unique=True, verbose_name="Category Name")
@@ -8,6 +10,53 @@ class ExpenseCategory(models.Model):
     def __str__(self):
         return self.name
 
+class IncomeQuerySet(models.QuerySet):
+    def sync_for_jobs(self, jobs):
+        """
+        درآمد هر کار را با مبلغ deal آن هماهنگ می‌کند، برای همه کارها با چند کوئری ثابت.
+        Jobs with a positive deal get one Income (created or updated); the
+        income of jobs without a deal is deleted.
+        """
+        jobs = list(jobs)
+        paid = [job for job in jobs if job.deal and job.deal > 0]
+        unpaid_ids = [job.id for job in jobs if not (job.deal and job.deal > 0)]
+
+        if unpaid_ids:
+            self.filter(repair_job_id__in=unpaid_ids).delete()
+        if not paid:
+            return
+
+        # Cars are only needed for the description; load the missing ones at once.
+        missing_cars = {job.car_id for job in paid if not RepairJob.car.is_cached(job)}
+        cars = Car.objects.in_bulk(missing_cars) if missing_cars else {}
+
+        existing = {}
+        for income in self.filter(repair_job_id__in=[job.id for job in paid]):
+            existing.setdefault(income.repair_job_id, []).append(income)
+
+        to_create, to_update = [], []
+        for job in paid:
+            car = cars.get(job.car_id) or job.car
+            values = {
+                'description': f"Approved deal for {car}",
+                'amount': job.deal,
+                'recorded_by_id': car.registered_by_id,
+            }
+            if job.id not in existing:
+                to_create.append(Income(repair_job=job, **values))
+                continue
+            for income in existing[job.id]:
+                if any(getattr(income, field) != value for field, value in values.items()):
+                    for field, value in values.items():
+                        setattr(income, field, value)
+                    to_update.append(income)
+
+        if to_create:
+            self.bulk_create(to_create)
+        if to_update:
+            self.bulk_update(to_update, ['description', 'amount', 'recorded_by'])
+
+
 class Income(models.Model):
     """Tracks all incoming money."""
     repair_job = models.ForeignKey(
@@ -23,14 +72,37 @@ class Income(models.Model):
     transaction_date = models.DateTimeField(auto_now_add=True, verbose_name="Date and Time of Transaction")
     recorded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, verbose_name="Recorded By")
 
+    objects = IncomeQuerySet.as_manager()
+
     class Meta:
         ordering = ['-transaction_date']
+        indexes = [
+            models.Index(fields=['transaction_date', 'id'], name='acc_income_date_idx'),
+        ]
 
     def __str__(self):
         return f"Income of {self.amount} from {self.source or 'Unknown'}"
 
+    def save(self, *args, **kwargs):
+        if not self.repair_job_id:
+            super().save(*args, **kwargs)
+            return
+        # صفحه جزئیات کار مرتبط دوباره رندر می‌شود.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            RepairJob.objects.filter(id=self.repair_job_id).bump_detail_version()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            deleted = super().delete(*args, **kwargs)
+            if self.repair_job_id:
+                RepairJob.objects.filter(id=self.repair_job_id).bump_detail_version()
+        return deleted
+
 
 from django.db import models
+from django.db.models import Count, ExpressionWrapper, F, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce
 from django.conf import settings
 from decimal import Decimal
 
@@ -48,6 +120,10 @@ class Employee(models.Model):
     id_card = models.CharField(max_length=20, verbose_name="ID Card", default="-")
     card_number = models.CharField(max_length=20, verbose_name="Card Number", default="-")
 
+    class Meta:
+        indexes = [
+            BTreeIndex(OpClass(Upper('full_name'), name='text_pattern_ops'), name='acc_employee_prefix_idx'),
+        ]
 
     def __str__(self):
         return self.full_name
@@ -66,6 +142,53 @@ class Attendance(models.Model):
     def __str__(self):
         return f"Absence for {self.employee.full_name} on {self.date}"
     
+# حقوق پایه ماهانه بر این تعداد ساعت تقسیم می‌شود و هر روز غیبت معادل ۱۰ ساعت کاری است.
+HOURS_PER_MONTH = Decimal('300.0')
+HOURS_PER_ABSENCE_DAY = 10
+
+
+class SalarySlipQuerySet(models.QuerySet):
+    def with_absence_count(self):
+        """
+        تعداد غیبت‌های هر دوره را با یک زیرکوئری محاسبه می‌کند تا برای هر فیش
+        کوئری جداگانه‌ای اجرا نشود.
+        """
+        absences = Attendance.objects.filter(
+            employee=OuterRef('employee'),
+            date__gte=OuterRef('pay_period_start'),
+            date__lte=OuterRef('pay_period_end'),
+        ).order_by().values('employee').annotate(count=Count('id')).values('count')
+        return self.annotate(
+            absence_count=Coalesce(Subquery(absences, output_field=models.IntegerField()), 0)
+        )
+
+    def with_totals(self):
+        """
+        نرخ ساعتی، جریمه غیبت، مبلغ قابل پرداخت (cost) و باقیمانده (rest) را
+        در خود کوئری محاسبه می‌کند تا نمایش N فیش فقط یک کوئری هزینه داشته باشد.
+        propertyهای مدل در صورت وجود از همین مقادیر استفاده می‌کنند.
+        """
+        money = models.DecimalField(max_digits=20, decimal_places=6)
+        hours_cost = (Cast('extra_h', money) - Cast('mines_h', money)) * F('annotated_hourly_rate')
+        total_owed = (
+            F('employee__base_salary') + F('remaining_before') + hours_cost
+            + F('extra') - F('mines') - F('annotated_absence_deduction')
+        )
+        return self.with_absence_count().annotate(
+            annotated_hourly_rate=ExpressionWrapper(
+                F('employee__base_salary') / Value(HOURS_PER_MONTH), output_field=money
+            ),
+        ).annotate(
+            annotated_absence_deduction=ExpressionWrapper(
+                F('absence_count') * Value(HOURS_PER_ABSENCE_DAY) * F('annotated_hourly_rate'),
+                output_field=money,
+            ),
+        ).annotate(
+            # cost و rest یک مقدارند؛ یک بار محاسبه می‌شود.
+            annotated_balance=ExpressionWrapper(total_owed - F('paid'), output_field=money),
+        )
+
+
 class SalarySlip(models.Model):
     """Stores a single salary payment record for an employee for a specific period."""
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name="salary_slips")
@@ -81,11 +204,54 @@ class SalarySlip(models.Model):
     description = models.CharField(max_length=255, blank=True, null=True)
     is_closed = models.BooleanField(default=False, verbose_name="Is Period Closed?")
 
+    # مقادیر محاسبه‌شده در لحظه بستن دوره؛ برای دوره‌های بسته به جای محاسبه مجدد خوانده می‌شوند.
+    closed_absence_days = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    closed_absence_deduction = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False)
+    closed_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False)
+    closed_rest = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False)
+
+    objects = SalarySlipQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['employee', 'pay_period_end'], name='acc_slip_employee_end_idx'),
+        ]
+
     # --- START: متدهای property با منطق جدید ---
 
+    @property
+    def has_snapshot(self):
+        """آیا مقادیر این دوره بسته‌شده ذخیره شده‌اند؟"""
+        return self.is_closed and self.closed_rest is not None
+
+    def freeze_totals(self):
+        """
+        مقادیر فعلی غیبت، جریمه، cost و rest را روی فیش ذخیره می‌کند.
+        باید هنگام بستن دوره و پیش از save فراخوانی شود.
+        """
+        absence_days = self.absence_days
+        absence_deduction = round(self.absence_deduction, 2)
+        cost = self.cost
+        rest = self.rest
+
+        self.closed_absence_days = absence_days
+        self.closed_absence_deduction = absence_deduction
+        self.closed_cost = cost
+        self.closed_rest = rest
+
+    def clear_snapshot(self):
+        self.closed_absence_days = None
+        self.closed_absence_deduction = None
+        self.closed_cost = None
+        self.closed_rest = None
+
     @property
     def absence_days(self):
         """تعداد روزهای غیبت ثبت شده در این دوره حقوقی را محاسبه می‌کند."""
+        if self.has_snapshot:
+            return self.closed_absence_days
+        if hasattr(self, 'absence_count'):
+            return self.absence_count
         return Attendance.objects.filter(
             employee=self.employee,
             date__range=(self.pay_period_start, self.pay_period_end)
@@ -94,43 +260,56 @@ class SalarySlip(models.Model):
     @property
     def hourly_rate(self):
         """نرخ دستمزد ساعتی را بر اساس حقوق پایه محاسبه می‌کند."""
+        if hasattr(self, 'annotated_hourly_rate'):
+            return self.annotated_hourly_rate
         if self.employee.base_salary:
-            return self.employee.base_salary / Decimal('300.0')
+            return self.employee.base_salary / HOURS_PER_MONTH
         return Decimal('0.0')
 
     @property
     def absence_deduction(self):
         """مبلغ کل جریمه غیبت را محاسبه می‌کند (هر روز غیبت = ۱۰ ساعت کاری)."""
-        return Decimal(self.absence_days * 10) * self.hourly_rate
-        
+        if self.has_snapshot:
+            return self.closed_absence_deduction
+        if hasattr(self, 'annotated_absence_deduction'):
+            return self.annotated_absence_deduction
+        return Decimal(self.absence_days * HOURS_PER_ABSENCE_DAY) * self.hourly_rate
+
+    @property
+    def extra_h_cost(self):
+        """ارزش ساعات اضافه‌کاری."""
+        return Decimal(str(self.extra_h)) * self.hourly_rate
+
+    @property
+    def mines_h_cost(self):
+        """ارزش ساعات کسری."""
+        return Decimal(str(self.mines_h)) * self.hourly_rate
+
+    def _total_owed(self):
+        """کل مبلغ بدهی این دوره، پیش از کسر مبلغ پرداخت‌شده."""
+        return (self.employee.base_salary + self.remaining_before +
+                self.extra_h_cost - self.mines_h_cost +
+                self.extra - self.mines - self.absence_deduction)
+
     @property
     def cost(self):
         """
         مبلغ نهایی قابل پرداخت در این دوره را با در نظر گرفتن تمام موارد محاسبه می‌کند.
         """
-        salary = self.employee.base_salary
-        
-        # محاسبه ارزش اضافه‌کاری و کسری ساعت
-        extra_h_cost = Decimal(str(self.extra_h)) * self.hourly_rate
-        mines_h_cost = Decimal(str(self.mines_h)) * self.hourly_rate
-        
-        # محاسبه نهایی با کسر جریمه غیبت
-        total_cost = (salary + self.remaining_before - self.paid + 
-                      extra_h_cost - mines_h_cost + 
-                      self.extra - self.mines - self.absence_deduction)
-        
-        return round(total_cost, 2)
-        
+        if self.has_snapshot:
+            return self.closed_cost
+        if hasattr(self, 'annotated_balance'):
+            return round(self.annotated_balance, 2)
+        return round(self._total_owed() - self.paid, 2)
+
     @property
     def rest(self):
         """باقیمانده حساب برای انتقال به دوره بعد را محاسبه می‌کند."""
-        total_owed = (self.employee.base_salary + self.remaining_before + 
-                      (Decimal(str(self.extra_h)) * self.hourly_rate) + self.extra - 
-                      (Decimal(str(self.mines_h)) * self.hourly_rate) - self.mines -
-                      self.absence_deduction)
-                      
-        remaining = total_owed - self.paid
-        return round(remaining, 2)
+        if self.has_snapshot:
+            return self.closed_rest
+        if hasattr(self, 'annotated_balance'):
+            return round(self.annotated_balance, 2)
+        return round(self._total_owed() - self.paid, 2)
 
     def __str__(self):
         return f"Salary for {self.employee.full_name} for period ending {self.pay_period_end}"
@@ -173,6 +352,10 @@ class Expense(models.Model):
 
     class Meta:
         ordering = ['-transaction_date']
+        indexes = [
+            models.Index(fields=['transaction_date', 'id'], name='acc_expense_date_idx'),
+            models.Index(fields=['employee', 'expense_type', 'transaction_date'], name='acc_expense_employee_idx'),
+        ]
         permissions = [
             ("can_change_expense_recorder", "Can change the recorder of an expense"),
         ]
@@ -1,3 +1,269 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.paginator import Paginator
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.models import Car, RepairJob, Part
+from .forms import IncomeForm, SimpleExpenseForm
+from .models import Attendance, Employee, Income, Expense, ExpenseCategory, SalarySlip
+from . import ledger
+
+
+def touch_row(tx):
+    """Follows the same relations as a dashboard row / Excel export row."""
+    if getattr(tx, 'repair_job', None):
+        str(tx.repair_job.car)
+    elif getattr(tx, 'related_part', None) and tx.related_part.repair_job:
+        str(tx.related_part.repair_job.car)
+    if getattr(tx, 'category', None):
+        tx.category.name
+    if tx.recorded_by:
+        tx.recorded_by.username
+
+
+class LedgerQueryBudgetTests(TestCase):
+    """A ledger page or an export costs the same queries whatever its size."""
+
+    def create_transactions(self, count):
+        user = User.objects.create_user(username=f'clerk{count}')
+        category = ExpenseCategory.objects.create(name=f'Rent {count}')
+        for i in range(count):
+            car = Car.objects.create(plate_number=f'{count}-{i}', year=2020, registered_by=user)
+            job = RepairJob.objects.create(car=car)
+            part = Part.objects.create(repair_job=job, name='Bumper')
+            Income.objects.create(repair_job=job, description='Deal', amount=100, recorded_by=user)
+            Expense.objects.create(
+                expense_type='part', description='Part', amount=-10,
+                related_part=part, recorded_by=user,
+            )
+            Expense.objects.create(
+                expense_type='garage', description='Rent', amount=-5,
+                category=category, recorded_by=user,
+            )
+        return user
+
+    def render_page(self):
+        page = Paginator(ledger.ledger_rows(), 15).get_page(1)
+        for tx in ledger.hydrate(page.object_list):
+            touch_row(tx)
+
+    def test_page_query_count_is_constant(self):
+        self.create_transactions(5)
+        # count, page slice, incomes, expenses
+        with self.assertNumQueries(4):
+            self.render_page()
+
+        self.create_transactions(100)
+        with self.assertNumQueries(4):
+            self.render_page()
+
+    def export_query_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('accounting:export_excel'))
+            b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_export_query_count_is_constant(self):
+        user = self.create_transactions(5)
+        self.client.force_login(user)
+        small = self.export_query_count()
+
+        self.create_transactions(100)
+        self.assertEqual(self.export_query_count(), small)
+
+
+class ChoiceCacheTests(TestCase):
+    """Dropdown lists are built once and rebuilt after a change; long lists are autocompleted."""
+
+    def setUp(self):
+        cache.clear()
+        # Writes in one transaction share an invalidation callback, so every
+        # write here runs its callbacks before the next one.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = User.objects.create_user(username='clerk', is_staff=True)
+            self.client.force_login(self.user)
+
+    def render_categories(self):
+        return str(SimpleExpenseForm()['category'])
+
+    def test_list_is_cached_until_a_change_commits(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ExpenseCategory.objects.create(name='Rent')
+        self.assertIn('Rent', self.render_categories())
+        with self.assertNumQueries(0):
+            self.assertIn('Rent', self.render_categories())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ExpenseCategory.objects.create(name='Power')
+        self.assertIn('Power', self.render_categories())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ExpenseCategory.objects.filter(name='Rent').delete()
+        self.assertNotIn('Rent', self.render_categories())
+
+    def test_dashboard_queries_do_not_grow_with_jobs(self):
+        url = reverse('accounting:dashboard')
+
+        def dashboard_queries():
+            self.client.get(url)  # fills the cache
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            return len(queries)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            car = Car.objects.create(plate_number='A-1', year=2020, registered_by=self.user)
+            RepairJob.objects.create(car=car)
+        baseline = dashboard_queries()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(20):
+                car = Car.objects.create(plate_number=f'B-{i}', year=2020, registered_by=self.user)
+                RepairJob.objects.create(car=car)
+        self.assertEqual(dashboard_queries(), baseline)
+        # Cars and jobs are picked by autocomplete, not shipped as options.
+        self.assertNotContains(self.client.get(url), 'B-19')
+
+    def test_repair_job_is_picked_by_autocomplete(self):
+        car = Car.objects.create(plate_number='XY-77', claim_number='CL-9', year=2020, registered_by=self.user)
+        job = RepairJob.objects.create(car=car)
+        other = RepairJob.objects.create(
+            car=Car.objects.create(plate_number='ZZ-1', year=2020, registered_by=self.user),
+        )
+        self.assertNotIn('XY-77', str(IncomeForm()['repair_job']))
+        self.assertIn('XY-77', str(IncomeForm(initial={'repair_job': job.id})['repair_job']))
+
+        url = reverse('accounting:repair_job_autocomplete')
+        for q in ('xy-7', 'CL-9', f'#{job.id}'):
+            results = self.client.get(url, {'q': q}).json()['results']
+            self.assertEqual([r['id'] for r in results], [str(job.id)], q)
+        results = self.client.get(url).json()['results']
+        self.assertEqual([r['id'] for r in results], [str(other.id), str(job.id)])
+
+    def test_car_autocomplete_matches_plate_prefix_of_open_jobs(self):
+        open_car = Car.objects.create(plate_number='KL-10', year=2020, registered_by=self.user)
+        RepairJob.objects.create(car=open_car)
+        done_car = Car.objects.create(plate_number='KL-11', year=2020, registered_by=self.user)
+        RepairJob.objects.create(car=done_car, status=RepairJob.Stage.ARCHIVED)
+        Car.objects.create(plate_number='XKL-1', year=2020, registered_by=self.user)
+
+        url = reverse('accounting:car_autocomplete')
+        results = self.client.get(url, {'q': 'kl'}).json()['results']
+        self.assertEqual([r['id'] for r in results], [str(open_car.id)])
+
+    def test_autocomplete_pages_are_capped_and_cached(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(25):
+                Employee.objects.create(full_name=f'Emp {i:02}', base_salary=100, hire_date='2024-01-01')
+        url = reverse('accounting:employee_autocomplete')
+
+        first = self.client.get(url, {'q': 'emp'}).json()
+        self.assertEqual(len(first['results']), 20)
+        self.assertTrue(first['pagination']['more'])
+
+        # Only the session and user are loaded once the page is cached.
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(url, {'q': 'emp'}).json(), first)
+
+        page_two = {'q': 'emp', 'page': 2}
+        self.assertEqual(len(self.client.get(url, page_two).json()['results']), 5)
+        with self.captureOnCommitCallbacks(execute=True):
+            Employee.objects.create(full_name='Emp 99', base_salary=100, hire_date='2024-01-01')
+        self.assertEqual(len(self.client.get(url, page_two).json()['results']), 6)
+
+
+class SalarySlipTotalsTests(TestCase):
+    """with_totals() computes in SQL exactly what the model properties compute in Python."""
+
+    def setUp(self):
+        self.start = date(2025, 3, 1)
+        self.slips = []
+        for i, (extra_h, mines_h, absences) in enumerate([(7.5, 2.25, 3), (0, 11.75, 0), (12.3, 0, 1)]):
+            employee = Employee.objects.create(
+                full_name=f'Worker {i}', base_salary=Decimal('3123.45') + i * 7, hire_date='2024-01-01',
+            )
+            for day in range(absences):
+                Attendance.objects.create(employee=employee, date=self.start + timedelta(days=day * 3))
+            # Outside the period; not deducted.
+            Attendance.objects.create(employee=employee, date=self.start - timedelta(days=1))
+            self.slips.append(SalarySlip.objects.create(
+                employee=employee, pay_period_start=self.start, pay_period_end=date(2025, 3, 31),
+                remaining_before=Decimal('120.37') * i - 40, extra_h=extra_h, mines_h=mines_h,
+                extra=Decimal('50.10'), mines=Decimal('15.55'), paid=Decimal('999.99'),
+            ))
+
+    def test_annotated_totals_match_python_totals(self):
+        for slip in self.slips:
+            plain = SalarySlip.objects.get(id=slip.id)
+            annotated = SalarySlip.objects.with_totals().get(id=slip.id)
+            self.assertEqual(annotated.absence_days, plain.absence_days)
+            self.assertEqual(round(annotated.absence_deduction, 2), round(plain.absence_deduction, 2))
+            self.assertEqual(annotated.cost, plain.cost)
+            self.assertEqual(annotated.rest, plain.rest)
+            self.assertEqual(annotated.cost.as_tuple().exponent, -2)
+
+    def test_totals_of_many_slips_cost_one_query(self):
+        with self.assertNumQueries(1):
+            slips = list(SalarySlip.objects.select_related('employee').with_totals())
+            totals = [(slip.absence_days, slip.cost, slip.rest) for slip in slips]
+        # Three created here plus each employee's automatic first slip.
+        self.assertEqual(len(totals), 6)
+
+
+class ClosedSlipSnapshotTests(TestCase):
+    """A closed pay period keeps the totals it was closed with."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser(username='manager'))
+        self.employee = Employee.objects.create(full_name='Closer', base_salary=3000, hire_date='2024-01-01')
+        self.slip = SalarySlip.objects.create(
+            employee=self.employee, pay_period_start=date(2025, 3, 1), pay_period_end=date(2025, 3, 31),
+            extra_h=4, paid=500,
+        )
+        Attendance.objects.create(employee=self.employee, date=date(2025, 3, 10))
+
+    def close(self):
+        self.client.post(reverse('reports:close_slip', args=[self.slip.id]), {'confirm_close': 'on'})
+        self.slip.refresh_from_db()
+
+    def test_closing_freezes_totals(self):
+        live = SalarySlip.objects.get(id=self.slip.id)
+        expected = (live.absence_days, round(live.absence_deduction, 2), live.cost, live.rest)
+        self.close()
+
+        self.assertTrue(self.slip.is_closed)
+        self.assertEqual(
+            (self.slip.closed_absence_days, self.slip.closed_absence_deduction,
+             self.slip.closed_cost, self.slip.closed_rest),
+            expected,
+        )
+        self.assertEqual(expected[:2], (1, Decimal('100.00')))
+
+        # A late absence does not change what the closed period reports.
+        Attendance.objects.create(employee=self.employee, date=date(2025, 3, 11))
+        for slip in (SalarySlip.objects.get(id=self.slip.id), SalarySlip.objects.with_totals().get(id=self.slip.id)):
+            self.assertEqual((slip.absence_days, slip.cost, slip.rest), (1, expected[2], expected[3]))
+
+    def test_verify_reports_drift_and_rebuild_fixes_it(self):
+        self.close()
+        call_command('payroll_snapshots', '--verify', stdout=StringIO())
+
+        SalarySlip.objects.filter(id=self.slip.id).update(closed_rest=1)
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('payroll_snapshots', '--verify', stdout=out)
+        self.assertIn(f'#{self.slip.id}', out.getvalue())
+        self.assertIn('closed_rest stored=1.00', out.getvalue())
 
-# Create your tests here.
+        call_command('payroll_snapshots', '--rebuild', stdout=StringIO())
+        call_command('payroll_snapshots', '--verify', stdout=StringIO())
+        self.slip.refresh_from_db()
+        self.assertEqual(self.slip.closed_rest, self.slip.closed_cost)
@@ -6,5 +6,8 @@ app_name = 'accounting'
 urlpatterns = [
     path('', views.accounting_dashboard_view, name='dashboard'),
     path('ajax/get_parts/', views.get_parts_for_car, name='ajax_get_parts'),       
+    path('ajax/repair-jobs/', views.RepairJobAutocomplete.as_view(), name='repair_job_autocomplete'),
+    path('ajax/cars/', views.CarAutocomplete.as_view(), name='car_autocomplete'),
+    path('ajax/employees/', views.EmployeeAutocomplete.as_view(), name='employee_autocomplete'),
     path('export-excel/', views.export_excel_view, name='export_excel'),
 ]
@@ -4,18 +4,17 @@ from django.contrib import messages
 from django.http import JsonResponse, HttpResponse
 from django.utils import timezone
 from django.core.paginator import Paginator
-from itertools import chain
-from operator import attrgetter
+from django.db.models import Q
 from decimal import Decimal
-import openpyxl
-from io import BytesIO
 
 # Import models from your apps
 from .models import Income, Expense, ExpenseCategory, Employee, SalarySlip
+from . import choices, ledger
 from core.models import Part, Car, RepairJob  # Employee model is needed
+from core.exports import xlsx_response, EXPORT_CHUNK_SIZE
 
 # Import forms from your app
-from .forms import IncomeForm, BuyPartForm, SimpleExpenseForm
+from .forms import IncomeForm, BuyPartForm, SimpleExpenseForm, purchasable_cars
 
 @login_required
 def accounting_dashboard_view(request):
@@ -103,34 +102,12 @@ def accounting_dashboard_view(request):
             else:
                 messages.error(request, "Please correct the errors in the expense form.")
     
-    income_list = Income.objects.all()
-    expense_list = Expense.objects.all()
-    
-    type_filter = request.GET.get('type')
-    from_date = request.GET.get('from')
-    to_date = request.GET.get('to')
-
-    if type_filter == 'income':
-        expense_list = expense_list.none()
-    elif type_filter == 'expense':
-        income_list = income_list.none()
-
-    if from_date:
-        income_list = income_list.filter(transaction_date__date__gte=from_date)
-        expense_list = expense_list.filter(transaction_date__date__gte=from_date)
-    if to_date:
-        income_list = income_list.filter(transaction_date__date__lte=to_date)
-        expense_list = expense_list.filter(transaction_date__date__lte=to_date)
-
-    transactions = sorted(
-        chain(income_list, expense_list),
-        key=attrgetter('transaction_date'),
-        reverse=True
-    )
+    transactions = ledger.ledger_rows(**ledger.ledger_filters(request.GET))
 
     paginator = Paginator(transactions, 15) 
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    page_obj.object_list = ledger.hydrate(page_obj.object_list)
 
     context = {
         'page_obj': page_obj,
@@ -147,41 +124,64 @@ def get_parts_for_car(request):
         return JsonResponse({'parts': []})
     try:
         car = Car.objects.get(id=car_id)
-        parts_queryset = Part.objects.filter(repair_job__car=car, is_bought=False).values('id', 'name', 'picture')
-        parts_list = list(parts_queryset)
+        parts_queryset = Part.objects.filter(repair_job__car=car, is_bought=False).only('id', 'name', 'picture', 'thumbnail')
+        parts_list = [
+            {'id': part.id, 'name': part.name, 'picture': part.thumbnail_url}
+            for part in parts_queryset
+        ]
         return JsonResponse({'parts': parts_list})
     except Car.DoesNotExist:
         return JsonResponse({'parts': []})
 
 
-@login_required
-def export_excel_view(request):
-    # This logic is duplicated. For larger projects, consider refactoring.
-    income_list = Income.objects.all()
-    expense_list = Expense.objects.all()
+class RepairJobAutocomplete(choices.CachedAutocompleteView):
+    """
+    گزینه‌های صفحه‌بندی شده فیلد repair_job فرم درآمد.
+    Matches plate or claim number (trigram indexed) or the job number.
+    """
+    cache_name = 'repair_jobs'
+
+    def get_queryset(self):
+        jobs = RepairJob.objects.select_related('car').order_by('-id')
+        q = self.q.strip()
+        if not q:
+            return jobs
+        match = Q(car__plate_number__icontains=q) | Q(car__claim_number__icontains=q)
+        if q.lstrip('#').isdigit():
+            match |= Q(id=int(q.lstrip('#')))
+        return jobs.filter(match)
+
+
+class CarAutocomplete(choices.CachedAutocompleteView):
+    """Cars a part can still be bought for, by plate prefix."""
+    cache_name = 'active_cars'
 
-    type_filter = request.GET.get('type')
-    from_date = request.GET.get('from')
-    to_date = request.GET.get('to')
+    def get_queryset(self):
+        cars = purchasable_cars().order_by('plate_number')
+        if self.q:
+            cars = cars.filter(plate_number__istartswith=self.q.strip())
+        return cars
 
-    if type_filter == 'income': expense_list = expense_list.none()
-    elif type_filter == 'expense': income_list = income_list.none()
 
-    if from_date:
-        income_list = income_list.filter(transaction_date__date__gte=from_date)
-        expense_list = expense_list.filter(transaction_date__date__gte=from_date)
-    if to_date:
-        income_list = income_list.filter(transaction_date__date__lte=to_date)
-        expense_list = expense_list.filter(transaction_date__date__lte=to_date)
+class EmployeeAutocomplete(choices.CachedAutocompleteView):
+    cache_name = 'employees'
 
-    transactions = sorted(chain(income_list, expense_list), key=attrgetter('transaction_date'), reverse=True)
+    def get_queryset(self):
+        employees = Employee.objects.order_by('full_name')
+        if self.q:
+            employees = employees.filter(full_name__istartswith=self.q.strip())
+        return employees
 
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Transactions"
-    ws.append(["Date", "Type", "Description", "Source / Category", "Recorded By", "Amount"])
 
-    for tx in transactions:
+@login_required
+def export_excel_view(request):
+    rows = ledger.ledger_rows(**ledger.ledger_filters(request.GET))
+    headers = ["Date", "Type", "Description", "Source / Category", "Recorded By", "Amount"]
+    return xlsx_response('transactions.xlsx', 'Transactions', headers, _transaction_rows(rows))
+
+
+def _transaction_rows(rows):
+    for tx in ledger.iter_transactions(rows, chunk_size=EXPORT_CHUNK_SIZE):
         tx_type = "Income" if tx.amount > 0 else "Expense"
         source_category = "-"
         if hasattr(tx, 'repair_job') and tx.repair_job: source_category = str(tx.repair_job.car)
@@ -189,23 +189,12 @@ def export_excel_view(request):
         elif hasattr(tx, 'source') and tx.source: source_category = tx.source
         elif hasattr(tx, 'category') and tx.category: source_category = tx.category.name
         recorded_by = tx.recorded_by.get_full_name() or tx.recorded_by.username if tx.recorded_by else "-"
-        
-        ws.append([
+
+        yield [
             tx.transaction_date.strftime("%Y-%m-%d %H:%M"),
             tx_type,
             tx.description,
             source_category,
             recorded_by,
             float(tx.amount)
-        ])
-
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    response = HttpResponse(
-        output,
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename=transactions.xlsx'
-    return response
\ No newline at end of file
+        ]
@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     "core",
     "accounts",
     'accounting',
@@ -54,6 +55,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Inactive unless PROFILING_ENABLED is set (see core/profiling.py).
+    'core.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'arabianUT.urls'
@@ -132,6 +135,36 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
 
+# Rendered PDFs, cached by a hash of their content (see core/pdfs.py).
+PDF_CACHE_DIR = BASE_DIR / 'pdf_cache'
+PDF_RENDER_WORKERS = config('PDF_RENDER_WORKERS', default=2, cast=int)
+# Seconds a download request waits for a render before showing a "preparing" page.
+PDF_RENDER_WAIT = config('PDF_RENDER_WAIT', default=15, cast=int)
+# Seconds a batch quotation export may render inside a request before asking the user to retry.
+PDF_BATCH_WAIT = config('PDF_BATCH_WAIT', default=60, cast=int)
+
+# A file cache is shared by all workers on the host, so invalidating a cached
+# dropdown list in one process (accounting/choices.py) reaches the others.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('CACHE_DIR', default=str(BASE_DIR / 'cache')),
+    }
+}
+# Upper bound on how long a dropdown list can be stale after a write that skips signals.
+CHOICES_CACHE_TIMEOUT = config('CHOICES_CACHE_TIMEOUT', default=300, cast=int)
+# Cached job detail fragments are keyed by RepairJob.detail_version; the timeout only
+# bounds staleness from writes that do not bump it (e.g. renaming the registering user).
+JOB_DETAIL_CACHE_TIMEOUT = config('JOB_DETAIL_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Per-request SQL/template/latency profiling, readable by staff at /profiling/.
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=False, cast=bool)
+# Requests kept in each process's ring buffer.
+PROFILING_BUFFER_SIZE = config('PROFILING_BUFFER_SIZE', default=500, cast=int)
+# The same SQL shape this many times in one request is flagged as a likely N+1.
+PROFILING_REPEAT_THRESHOLD = config('PROFILING_REPEAT_THRESHOLD', default=5, cast=int)
+PROFILING_EXCLUDE = ['/static/', '/media/', '/profiling/']
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Car, RepairJob, Part, Owner, QuotationItem, ItemName
+from .models import Car, RepairJob, Part, Owner, QuotationItem, ItemName, PurgedMedia
 
 admin.site.register(Car)
 admin.site.register(RepairJob)
@@ -7,8 +7,4 @@ admin.site.register(Part)
 admin.site.register(Owner)
 admin.site.register(QuotationItem)
 admin.site.register(ItemName)
-
-
-
-
-
+admin.site.register(PurgedMedia)
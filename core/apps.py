@@ -4,5 +4,3 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
-    def ready(self):
-        import core.signals
\ No newline at end of file
@@ -0,0 +1,36 @@
+import tempfile
+
+from django.http import FileResponse
+from openpyxl import Workbook
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Rows fetched per database round trip when exporting querysets.
+EXPORT_CHUNK_SIZE = 2000
+
+
+def xlsx_response(filename, title, headers, rows):
+    """
+    Writes ``rows`` into a write-only workbook and streams it back.
+
+    openpyxl's write-only mode flushes every appended row to disk, and the
+    finished file is streamed from a temporary file, so memory stays flat
+    however many rows the export has. ``rows`` can be any iterable, ideally
+    a generator over ``queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)``.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    sheet.append(headers)
+    for row in rows:
+        sheet.append(row)
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=filename,
+        content_type=XLSX_CONTENT_TYPE,
+    )
@@ -1,3 +1,4 @@
+from dal import autocomplete
 from django import forms
 from .models import Car, RepairJob, QuotationItem, Part, Owner
 from markdownx.widgets import MarkdownxWidget
@@ -68,7 +69,11 @@ class QuotationItemForm(forms.ModelForm):
         }
         widgets = {
             'custom_name': forms.TextInput(attrs={'class': 'form-control'}),
-            'item_name': forms.Select(attrs={'class': 'form-control'}),
+            # کاتالوگ آیتم‌ها بزرگ است؛ به جای <select> کامل، autocomplete.
+            'item_name': autocomplete.ModelSelect2(
+                url='core:item_name_autocomplete',
+                attrs={'class': 'form-control', 'data-placeholder': 'Search item', 'data-allow-clear': 'true'},
+            ),
             'quantity': forms.NumberInput(attrs={'min': 1}),
             'price': forms.NumberInput(attrs={'step': 0.01}),
             'position': forms.Select(),
@@ -132,4 +137,46 @@ class BuyPartForm(forms.ModelForm):
         fields = ['price']
         widgets = {
             'price': forms.NumberInput(attrs={'step': '0.01', 'class': 'form-control'}),
-        }
\ No newline at end of file
+        }
+
+class QuotationBatchForm(forms.Form):
+    """Selects the jobs whose quotations are exported together."""
+    STATUS_CHOICES = [('', 'All Statuses')] + RepairJob.Stage.choices
+    FORMAT_CHOICES = [('zip', 'ZIP of PDFs'), ('pdf', 'One merged PDF')]
+
+    status = forms.ChoiceField(
+        choices=STATUS_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    start_date = forms.DateField(
+        required=False,
+        label="Registered From",
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
+    )
+    end_date = forms.DateField(
+        required=False,
+        label="Registered To",
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
+    )
+    claim_numbers = forms.CharField(
+        required=False,
+        label="Claim Numbers",
+        help_text="One per line, or separated by commas.",
+        widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 4})
+    )
+    output = forms.ChoiceField(
+        choices=FORMAT_CHOICES,
+        initial='zip',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+
+    def clean_claim_numbers(self):
+        value = self.cleaned_data.get('claim_numbers', '')
+        return [claim for claim in value.replace(',', '\n').split() if claim]
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not any(cleaned_data.get(name) for name in ('status', 'start_date', 'end_date', 'claim_numbers')):
+            raise forms.ValidationError("Choose at least one filter.")
+        return cleaned_data
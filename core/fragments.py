@@ -0,0 +1,25 @@
+"""
+کش قطعه‌ای صفحه جزئیات کار (job_detail).
+
+The page body is cached with ``{% cache %}`` under the job id and its
+``RepairJob.detail_version``. Every write that changes what the page shows
+bumps that version in the same transaction: saves of the job itself, its
+parts, quotation items and income, its car, and renamed item names (see the
+model ``save``/``delete`` methods and ``RepairJobQuerySet.bump_detail_version``
+for bulk writes). An unchanged job therefore costs its row plus one cache
+lookup, and an old version's fragment simply ages out.
+
+Forms in the cached body need the user's CSRF token, which must never be
+stored: the page is rendered with a placeholder token and the real one is
+swapped in afterwards.
+"""
+from django.middleware.csrf import get_token
+from django.shortcuts import render
+
+CSRF_PLACEHOLDER = 'csrf-token-placeholder'
+
+
+def render_with_csrf_placeholder(request, template_name, context):
+    response = render(request, template_name, {**context, 'csrf_token': CSRF_PLACEHOLDER})
+    response.content = response.content.replace(CSRF_PLACEHOLDER.encode(), get_token(request).encode())
+    return response
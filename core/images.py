@@ -0,0 +1,97 @@
+"""
+پردازش تصاویر آپلود شده: حذف EXIF، کوچک‌سازی و فشرده‌سازی، و ساخت تصویر بندانگشتی.
+
+Phone uploads are several megabytes of full-resolution JPEG with GPS EXIF.
+Originals are re-encoded to at most ``ORIGINAL_MAX_SIZE`` pixels on their long
+side, and a WebP thumbnail of ``THUMBNAIL_SIZE`` is stored next to them for
+the pages and JSON endpoints that only need a preview.
+"""
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+ORIGINAL_MAX_SIZE = (1600, 1600)
+ORIGINAL_QUALITY = 82
+THUMBNAIL_SIZE = (480, 480)
+THUMBNAIL_QUALITY = 75
+
+# خطاهایی که Pillow برای فایل خراب یا غیرتصویری می‌دهد.
+IMAGE_ERRORS = (OSError, ValueError, Image.DecompressionBombError)
+
+
+def _open(file):
+    file.seek(0)
+    image = Image.open(file)
+    # جهت عکس را از EXIF اعمال می‌کنیم، چون خود EXIF دور ریخته می‌شود.
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    return image
+
+
+def _encode(image, size, format, quality, **options):
+    image = image.copy()
+    image.thumbnail(size, Image.Resampling.LANCZOS)
+    buffer = BytesIO()
+    # بدون exif=... ذخیره می‌شود، پس متادیتای اصلی (از جمله GPS) منتقل نمی‌شود.
+    image.save(buffer, format=format, quality=quality, **options)
+    return buffer.getvalue()
+
+
+def process_image(file):
+    """
+    Returns ``(original, thumbnail)`` as bytes: a recompressed JPEG without
+    EXIF, and a WebP thumbnail. Raises one of ``IMAGE_ERRORS`` for unreadable files.
+    """
+    with _open(file) as image:
+        original = _encode(image, ORIGINAL_MAX_SIZE, 'JPEG', ORIGINAL_QUALITY, optimize=True, progressive=True)
+        thumbnail = _encode(image, THUMBNAIL_SIZE, 'WEBP', THUMBNAIL_QUALITY, method=4)
+    return original, thumbnail
+
+
+def ingest(instance, field_name, thumbnail_field_name):
+    """
+    Processes a newly assigned upload on ``instance`` before it is saved.
+
+    Only uncommitted files (fresh uploads) are touched, so ordinary saves cost
+    nothing. If Pillow can't read the file the upload is stored unchanged and
+    the thumbnail stays empty for ``process_images`` to report.
+    """
+    field = getattr(instance, field_name)
+    thumbnail = getattr(instance, thumbnail_field_name)
+    if not field:
+        if thumbnail:
+            setattr(instance, thumbnail_field_name, None)
+        return
+    if field._committed:
+        return
+
+    try:
+        original, preview = process_image(field.file)
+    except IMAGE_ERRORS:
+        setattr(instance, thumbnail_field_name, None)
+        return
+
+    stem = os.path.splitext(os.path.basename(field.name))[0]
+    field.save(f'{stem}.jpg', ContentFile(original), save=False)
+    thumbnail.save(f'{stem}.webp', ContentFile(preview), save=False)
+
+
+def reprocess(instance, field_name, thumbnail_field_name):
+    """
+    Re-encodes an already stored image (for ``process_images``) and returns the
+    names of the files it replaced; the caller deletes them once the new names
+    are saved.
+    """
+    field = getattr(instance, field_name)
+    thumbnail = getattr(instance, thumbnail_field_name)
+    replaced = [file.name for file in (field, thumbnail) if file]
+    with field.open('rb'):
+        original, preview = process_image(field.file)
+
+    stem = os.path.splitext(os.path.basename(field.name))[0]
+    field.save(f'{stem}.jpg', ContentFile(original), save=False)
+    thumbnail.save(f'{stem}.webp', ContentFile(preview), save=False)
+    return replaced
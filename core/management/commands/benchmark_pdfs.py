@@ -0,0 +1,69 @@
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import pdfs
+from core.models import RepairJob
+from core.pdf_worker import Renderer, render_pdf
+
+
+class Command(BaseCommand):
+    help = (
+        "Reports cold and warm PDF render latency. Cold builds a fresh renderer "
+        "(fonts, stylesheets, static files) for every document, as each request "
+        "used to; warm reuses one renderer like a pool worker does."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=10)
+        parser.add_argument('--job', type=int, help="Repair job to render; defaults to the latest one.")
+        parser.add_argument('--kind', choices=sorted(pdfs.STYLESHEETS), default='quotation')
+        parser.add_argument('--pool', action='store_true', help="Also time renders through the worker pool.")
+
+    def handle(self, *args, **options):
+        jobs = RepairJob.objects.select_related('car__owner').order_by('-id')
+        job = jobs.filter(id=options['job']).first() if options['job'] else jobs.first()
+        if job is None:
+            raise CommandError("No repair job to render.")
+
+        artifact = pdfs.quotation_pdf(job) if options['kind'] == 'quotation' else pdfs.car_owner_pdf(job.car)
+        runs = options['runs']
+
+        with tempfile.TemporaryDirectory() as tmp:
+            target = Path(tmp) / 'out.pdf'
+
+            def cold():
+                Renderer(*pdfs.worker_args()).write_pdf(artifact.html, artifact.kind, target)
+
+            renderer = Renderer(*pdfs.worker_args())
+
+            def warm():
+                renderer.write_pdf(artifact.html, artifact.kind, target)
+
+            self.report('cold (fresh renderer)', [self.timed(cold) for _ in range(runs)])
+            warm()
+            self.report('warm (reused renderer)', [self.timed(warm) for _ in range(runs)])
+
+            if options['pool']:
+                pool = pdfs._pool()
+
+                def pooled():
+                    pool.submit(render_pdf, artifact.html, artifact.kind, str(target)).result()
+
+                self.report('pool, first call', [self.timed(pooled)])
+                self.report('pool, warm', [self.timed(pooled) for _ in range(runs)])
+
+    @staticmethod
+    def timed(func):
+        start = time.perf_counter()
+        func()
+        return (time.perf_counter() - start) * 1000
+
+    def report(self, label, timings):
+        self.stdout.write(
+            f"{label:<24} min {min(timings):8.1f} ms  median {statistics.median(timings):8.1f} ms  "
+            f"max {max(timings):8.1f} ms  ({len(timings)} runs)"
+        )
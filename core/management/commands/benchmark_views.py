@@ -0,0 +1,177 @@
+import json
+import statistics
+import subprocess
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounting.models import Employee, Expense, Income
+from core.models import Car, Part, QuotationItem, RepairJob
+
+from .seed_garage_data import SEED_PREFIX
+
+# A run is flagged by --compare when it is this much slower or runs more queries.
+REGRESSION_RATIO = 1.2
+
+
+def targets():
+    """(name, url) of the hot views, pointed at seeded rows where they need an object."""
+    job = (
+        RepairJob.objects.filter(car__plate_number__startswith=f'{SEED_PREFIX}-', quotation_items__isnull=False)
+        .order_by('-id').first()
+    )
+    employee = Employee.objects.filter(full_name__startswith=SEED_PREFIX).order_by('id').first()
+    if job is None or employee is None:
+        raise CommandError("No seeded data; run seed_garage_data first.")
+
+    month_ago = (timezone.localdate() - timedelta(days=30)).isoformat()
+    return [
+        ('car_list', reverse('core:car_list')),
+        ('car_list_filtered', reverse('core:car_list') + '?status=working'),
+        ('job_detail', reverse('core:job_detail', args=[job.id])),
+        ('repair_dashboard', reverse('core:repair_dashboard')),
+        ('ledger', reverse('accounting:dashboard')),
+        ('ledger_export', reverse('accounting:export_excel') + f'?from={month_ago}'),
+        ('operational_report', reverse('reports:operational_report')),
+        ('operational_export', reverse('reports:export_operational_excel') + f'?start_date={month_ago}'),
+        ('financial_report', reverse('reports:financial_report')),
+        ('financial_export', reverse('reports:export_financial_excel') + f'?start_date={month_ago}'),
+        ('payroll_report', reverse('reports:payroll_report')),
+        ('payroll_dashboard', reverse('reports:payroll_dashboard')),
+        ('employee_payroll', reverse('reports:employee_detail', args=[employee.id])),
+        ('profit_report', reverse('reports:profit_report') + f'?from={month_ago}'),
+        ('turnaround_report', reverse('reports:turnaround_report')),
+        ('quotation_pdf', reverse('core:quotation_pdf', args=[job.id])),
+        ('car_owner_pdf', reverse('core:car_owner_pdf', args=[job.car_id])),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the hot views through the Django test client and records latency "
+        "and query counts as JSON under a label, e.g. one per commit; --compare "
+        "flags regressions between two runs. Seed data first with seed_garage_data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--label', default='current', help="Name of this run, used as the output file name.")
+        parser.add_argument('--output-dir', default='benchmarks/views', help="Where results are written.")
+        parser.add_argument('--runs', type=int, default=5, help="Timed requests per view, after one cold request.")
+        parser.add_argument('--only', nargs='+', metavar='NAME', help="Benchmark only these views.")
+        parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help="Compare two recorded runs.")
+
+    def handle(self, *args, **options):
+        output_dir = Path(options['output_dir'])
+        if options['compare']:
+            self.compare(output_dir, *options['compare'])
+            return
+
+        user, _ = User.objects.get_or_create(
+            username=f'{SEED_PREFIX.lower()}_bench', defaults={'is_staff': True, 'is_superuser': True},
+        )
+        client = Client()
+        client.force_login(user)
+
+        results = {}
+        # PDFs wait for their render instead of answering 202 "preparing".
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], PDF_RENDER_WAIT=300):
+            for name, url in targets():
+                if options['only'] and name not in options['only']:
+                    continue
+                result = results[name] = self.benchmark(client, url, options['runs'])
+                self.stdout.write(
+                    f"{name:<22} {result['status']:>4} {result['queries']:>5} queries "
+                    f"{self.format_ms(result['first_ms']):>12} cold {self.format_ms(result['median_ms']):>12} median"
+                )
+
+        report = {'meta': self.meta(options['runs']), 'results': results}
+        output_dir.mkdir(parents=True, exist_ok=True)
+        path = output_dir / f"{options['label']}.json"
+        path.write_text(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Results written to {path}"))
+
+    def benchmark(self, client, url, runs):
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            queries[-1] += 1
+            return execute(sql, params, many, context)
+
+        timings, status, size = [], None, 0
+        with connection.execute_wrapper(count):
+            for _ in range(runs + 1):
+                queries.append(0)
+                start = time.perf_counter()
+                response = client.get(url)
+                # Streaming exports and PDFs are only done once fully read.
+                body = b''.join(response.streaming_content) if response.streaming else response.content
+                timings.append((time.perf_counter() - start) * 1000)
+                status, size = response.status_code, len(body)
+
+        warm = timings[1:] or timings
+        return {
+            'url': url,
+            'status': status,
+            'bytes': size,
+            'queries': queries[-1],
+            'first_queries': queries[0],
+            'first_ms': round(timings[0], 2),
+            'median_ms': round(statistics.median(warm), 2),
+            'min_ms': round(min(warm), 2),
+            'max_ms': round(max(warm), 2),
+        }
+
+    @staticmethod
+    def meta(runs):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=settings.BASE_DIR,
+            ).stdout.strip() or None
+        except OSError:
+            commit = None
+        return {
+            'commit': commit,
+            'recorded_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'runs': runs,
+            'rows': {
+                model.__name__: model.objects.count()
+                for model in (Car, RepairJob, Part, QuotationItem, Income, Expense, Employee)
+            },
+        }
+
+    def compare(self, output_dir, before, after):
+        try:
+            runs = [json.loads((output_dir / f'{label}.json').read_text()) for label in (before, after)]
+        except FileNotFoundError as e:
+            raise CommandError(f"No recorded run: {e.filename}")
+
+        self.stdout.write(f"{'view':<22} {before:>12} {after:>12} {'queries':>11}")
+        regressions = 0
+        for name, result in runs[0]['results'].items():
+            other = runs[1]['results'].get(name)
+            if other is None:
+                continue
+            slower = other['median_ms'] > result['median_ms'] * REGRESSION_RATIO
+            more_queries = other['queries'] > result['queries']
+            regressions += slower or more_queries
+            flag = "  REGRESSION" if slower or more_queries else ""
+            self.stdout.write(
+                f"{name:<22} {self.format_ms(result['median_ms']):>12} {self.format_ms(other['median_ms']):>12} "
+                f"{result['queries']:>5} → {other['queries']:<4}{flag}"
+            )
+        if regressions:
+            self.stdout.write(self.style.WARNING(f"{regressions} regressed view(s)."))
+
+    @staticmethod
+    def format_ms(value):
+        return '-' if value is None else f'{value:.2f} ms'
@@ -0,0 +1,105 @@
+import json
+import re
+from datetime import timedelta
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from accounting import ledger
+from accounting.models import Attendance, Expense, Income, SalarySlip
+from core.models import Car, RepairJob
+
+EXECUTION_TIME = re.compile(r'Execution Time: ([\d.]+) ms')
+
+
+def hot_queries():
+    """The queries behind the list views and reports, shaped like the views run them."""
+    today = timezone.localdate()
+    month_ago = (today - timedelta(days=30)).isoformat()
+    active_jobs = RepairJob.objects.select_related('car').exclude(status=RepairJob.Stage.ARCHIVED)
+
+    return {
+        'car_list': active_jobs.order_by('-car__registered_at', '-id')[:26],
+        'car_list_by_status': active_jobs.filter(status=RepairJob.Stage.WORKING).order_by('-car__registered_at', '-id')[:26],
+        'active_cars': Car.objects.active().order_by('-registered_at', '-id')[:26],
+        'archived_cars': Car.objects.archived().order_by('-registered_at', '-id')[:26],
+        'financial_report': RepairJob.objects.select_related('car').filter(
+            approved_at__gte=timezone.now() - timedelta(days=30),
+        ).order_by('-approved_at')[:25],
+        'ledger_page': ledger.ledger_rows(from_date=month_ago)[:15],
+        'profit_report_incomes': Income.objects.filter(
+            **ledger.date_range(month_ago, today.isoformat())
+        ).order_by('-transaction_date', '-id')[:26],
+        'profit_report_expenses': Expense.objects.filter(
+            **ledger.date_range(month_ago, today.isoformat())
+        ).order_by('-transaction_date', '-id')[:26],
+        'payroll_report': SalarySlip.objects.select_related('employee').with_totals().filter(
+            pay_period_end__gte=today - timedelta(days=30),
+        ),
+        'employee_slips': SalarySlip.objects.filter(employee_id=1).order_by('-pay_period_end'),
+        'employee_absences': Attendance.objects.filter(employee_id=1, date__gte=today - timedelta(days=30)),
+        'employee_personal_expenses': Expense.objects.filter(
+            employee_id=1, expense_type=Expense.ExpenseType.PERSONAL,
+            transaction_date__gte=timezone.now() - timedelta(days=30),
+        ),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Records EXPLAIN ANALYZE plans of the hot list/report queries under a label, "
+        "e.g. run with --label before, apply the index migrations, run with "
+        "--label after, then --compare before after. Seed data first with seed_garage_data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--label', default='current', help="Name of this run, used as the output file name.")
+        parser.add_argument('--output-dir', default='benchmarks/explain', help="Where plans are written.")
+        parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help="Compare two recorded runs.")
+
+    def handle(self, *args, **options):
+        output_dir = Path(options['output_dir'])
+        if options['compare']:
+            self.compare(output_dir, *options['compare'])
+            return
+
+        analyze = connection.vendor == 'postgresql'
+        if not analyze:
+            self.stderr.write(self.style.WARNING(
+                f"{connection.vendor} has no EXPLAIN ANALYZE; recording plain plans without timings."
+            ))
+
+        results = {}
+        for name, queryset in hot_queries().items():
+            plan = queryset.explain(analyze=True, buffers=True) if analyze else queryset.explain()
+            match = EXECUTION_TIME.search(plan)
+            results[name] = {
+                'sql': str(queryset.query),
+                'plan': plan,
+                'execution_ms': float(match.group(1)) if match else None,
+            }
+            self.stdout.write(f"{name:<30} {self.format_ms(results[name]['execution_ms'])}")
+
+        output_dir.mkdir(parents=True, exist_ok=True)
+        path = output_dir / f"{options['label']}.json"
+        path.write_text(json.dumps(results, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Plans written to {path}"))
+
+    def compare(self, output_dir, before, after):
+        try:
+            runs = [json.loads((output_dir / f'{label}.json').read_text()) for label in (before, after)]
+        except FileNotFoundError as e:
+            raise CommandError(f"No recorded run: {e.filename}")
+
+        self.stdout.write(f"{'query':<30} {before:>12} {after:>12}")
+        for name, result in runs[0].items():
+            after_ms = runs[1].get(name, {}).get('execution_ms')
+            self.stdout.write(
+                f"{name:<30} {self.format_ms(result['execution_ms']):>12} {self.format_ms(after_ms):>12}"
+            )
+
+    @staticmethod
+    def format_ms(value):
+        return '-' if value is None else f'{value:.2f} ms'
@@ -0,0 +1,40 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import pdfs
+
+
+class Command(BaseCommand):
+    help = (
+        "Renders the quotations of the matching jobs across the PDF worker pool "
+        "and writes them to a ZIP or one merged PDF."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="Output file; a .pdf name writes one merged PDF, anything else a ZIP.")
+        parser.add_argument('--status')
+        parser.add_argument('--from', dest='start_date', type=date.fromisoformat, help="Registered on or after (YYYY-MM-DD).")
+        parser.add_argument('--to', dest='end_date', type=date.fromisoformat, help="Registered on or before (YYYY-MM-DD).")
+        parser.add_argument('--claim', dest='claim_numbers', action='append', help="Claim number; repeat for several.")
+        parser.add_argument('--workers', type=int, help="Worker processes (default: PDF_RENDER_WORKERS).")
+
+    def handle(self, *args, **options):
+        jobs = list(pdfs.quotation_batch_jobs(
+            options['status'], options['start_date'], options['end_date'], options['claim_numbers'],
+        ))
+        if not jobs:
+            raise CommandError("No jobs match these filters.")
+
+        start = time.perf_counter()
+        batch = pdfs.render_batch(jobs, workers=options['workers'])
+        with open(options['output'], 'wb') as output:
+            if options['output'].lower().endswith('.pdf'):
+                pdfs.write_merged_pdf(batch, output)
+            else:
+                pdfs.write_zip(batch, output)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {len(batch)} quotations to {options['output']} in {time.perf_counter() - start:.1f}s."
+        ))
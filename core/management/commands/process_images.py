@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from core import images, media
+from core.models import Car, Part, RepairJob
+
+# (model, image field) pairs; every one has a ``thumbnail`` field next to it.
+IMAGE_FIELDS = [(Car, 'image'), (Part, 'picture')]
+# The jobs whose detail page shows each model's images.
+JOB_LOOKUPS = {Car: 'car__in', Part: 'parts__in'}
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfills the upload pipeline for images stored before it existed: "
+        "strips EXIF, downsizes and recompresses originals and writes WebP thumbnails."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help="Rows written per bulk update.")
+        parser.add_argument('--force', action='store_true', help="Reprocess images that already have a thumbnail.")
+
+    def handle(self, *args, **options):
+        for model, field_name in IMAGE_FIELDS:
+            done, failed = self.process(model, field_name, options['batch_size'], options['force'])
+            self.stdout.write(self.style.SUCCESS(
+                f"{model.__name__}.{field_name}: processed {done}, unreadable {len(failed)}."
+            ))
+            for name in failed:
+                self.stderr.write(f"  could not read {name}")
+
+    def process(self, model, field_name, batch_size, force):
+        queryset = model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+        if not force:
+            queryset = queryset.filter(Q(thumbnail='') | Q(thumbnail__isnull=True))
+        queryset = queryset.only('id', field_name, 'thumbnail').order_by('id')
+
+        done, failed, last_id = 0, [], 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                return done, failed
+            last_id = batch[-1].id
+
+            changed, replaced = [], []
+            for instance in batch:
+                name = getattr(instance, field_name).name
+                try:
+                    replaced.extend(images.reprocess(instance, field_name, 'thumbnail'))
+                except images.IMAGE_ERRORS:
+                    failed.append(name)
+                    continue
+                changed.append(instance)
+            model.objects.bulk_update(changed, [field_name, 'thumbnail'])
+            RepairJob.objects.filter(**{JOB_LOOKUPS[model]: changed}).bump_detail_version()
+            # فایل‌های قدیمی پس از ثبت نام‌های جدید، و فقط اگر ارجاع دیگری نداشته باشند، حذف می‌شوند.
+            media.release(replaced)
+            done += len(changed)
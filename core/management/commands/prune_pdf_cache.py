@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from core import pdfs
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes superseded versions of cached PDFs that have not been served for "
+        "the grace period; the newest version of each document is kept. Safe to run "
+        "repeatedly, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-minutes', type=int, default=int(pdfs.PRUNE_GRACE.total_seconds() // 60),
+            help="Keep superseded PDFs served within this many minutes.",
+        )
+
+    def handle(self, *args, **options):
+        deleted = pdfs.prune_cache(grace=timedelta(minutes=options['grace_minutes']))
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} superseded PDFs."))
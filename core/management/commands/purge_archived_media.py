@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from core import media
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes the car images and part pictures of archived jobs that have not "
+        "been swept yet and records each file in PurgedMedia. Safe to run "
+        "repeatedly, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=media.DEFAULT_BATCH_SIZE, help="Jobs per transaction.")
+        parser.add_argument('--dry-run', action='store_true', help="List the files that would be deleted without touching anything.")
+
+    def handle(self, *args, **options):
+        result = media.purge_archived_media(batch_size=options['batch_size'], dry_run=options['dry_run'])
+
+        if options['dry_run']:
+            for name in result.names:
+                self.stdout.write(name)
+            verb = "Would delete"
+        else:
+            verb = "Deleted"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result.files} files ({filesizeformat(result.bytes)}) from {result.jobs} archived jobs."
+        ))
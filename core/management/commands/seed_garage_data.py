@@ -0,0 +1,299 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from accounting import choices
+from accounting.models import Attendance, Employee, Expense, ExpenseCategory, Income, SalarySlip
+from core.models import Car, ItemName, Owner, Part, QuotationItem, RepairJob
+
+# Seeded rows are tagged so --clear can remove them without touching real data.
+SEED_PREFIX = 'SEED'
+
+# Roughly how a garage's book looks: most jobs are long finished.
+STATUS_WEIGHTS = [
+    (RepairJob.Stage.ARCHIVED, 70),
+    (RepairJob.Stage.PENDING_EXPERT, 3),
+    (RepairJob.Stage.QUOTATION, 3),
+    (RepairJob.Stage.PENDING_APPROVAL, 3),
+    (RepairJob.Stage.PENDING_START, 3),
+    (RepairJob.Stage.PENDING_PART, 4),
+    (RepairJob.Stage.WORKING, 5),
+    (RepairJob.Stage.READY_TO_EXIT, 2),
+    (RepairJob.Stage.SIGN, 2),
+    (RepairJob.Stage.EXIT, 3),
+    (RepairJob.Stage.PAID, 2),
+]
+
+# The workflow in order; a job in a stage has passed every earlier one.
+STAGE_ORDER = list(RepairJob.Stage)
+
+# Timestamp set when a job reaches each stage, as the views do.
+STAGE_TIMESTAMPS = [
+    (RepairJob.Stage.QUOTATION, 'expert_inspected_at'),
+    (RepairJob.Stage.PENDING_START, 'approved_at'),
+    (RepairJob.Stage.WORKING, 'work_started_at'),
+    (RepairJob.Stage.READY_TO_EXIT, 'work_finished_at'),
+    (RepairJob.Stage.ARCHIVED, 'exited_at'),
+]
+
+PART_NAMES = ['Bumper', 'Headlight', 'Fender', 'Door Panel', 'Mirror', 'Grille', 'Hood', 'Tail Light', 'Radiator']
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds realistic volumes of owners, cars, jobs in every stage, parts, "
+        "quotation items, ledger rows and payroll data for benchmarking the "
+        "views and reports. Seeded rows are tagged "
+        f"with '{SEED_PREFIX}' and can be removed with --clear."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cars', type=int, default=20000, help="Number of cars (one repair job each).")
+        parser.add_argument('--employees', type=int, default=30, help="Number of employees.")
+        parser.add_argument('--days', type=int, default=730, help="How many days back the data spreads.")
+        parser.add_argument('--max-parts', type=int, default=4, help="Upper bound of parts per job.")
+        parser.add_argument('--max-quote-items', type=int, default=6, help="Upper bound of quotation items per job.")
+        parser.add_argument('--seed', type=int, default=1, help="Random seed, for repeatable data sets.")
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--clear', action='store_true', help="Only delete previously seeded rows.")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.days = options['days']
+
+        with transaction.atomic():
+            # bulk_create skips the signals that keep cached dropdown lists fresh.
+            transaction.on_commit(choices.invalidate)
+            self.clear()
+            if options['clear']:
+                self.stdout.write(self.style.SUCCESS("Seeded data removed."))
+                return
+
+            user, _ = User.objects.get_or_create(username=f'{SEED_PREFIX.lower()}_clerk')
+            jobs = self.seed_jobs(options['cars'], user)
+            self.seed_job_items(jobs, user, options['max_parts'], options['max_quote_items'])
+            self.seed_ledger(jobs, user)
+            self.seed_payroll(options['employees'], user)
+
+        if connection.vendor == 'postgresql':
+            # Reclaim the rows rewritten by bulk_update and refresh planner
+            # statistics, so EXPLAIN plans reflect the seeded volumes.
+            # VACUUM can't run inside a caller's transaction (e.g. a test).
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE' if connection.in_atomic_block else 'VACUUM ANALYZE')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(jobs)} cars/jobs and {options['employees']} employees over {self.days} days."
+        ))
+
+    def clear(self):
+        Income.objects.filter(source__startswith=SEED_PREFIX).delete()
+        Expense.objects.filter(description__startswith=SEED_PREFIX).delete()
+        Employee.objects.filter(full_name__startswith=SEED_PREFIX).delete()
+        Car.objects.filter(plate_number__startswith=f'{SEED_PREFIX}-').delete()
+        Owner.objects.filter(name__startswith=SEED_PREFIX).delete()
+        ItemName.objects.filter(name__startswith=SEED_PREFIX).delete()
+
+    def random_moment(self):
+        return self.now - timedelta(seconds=self.rng.randint(0, self.days * 24 * 3600))
+
+    def stage_times(self, registered_at, status):
+        """Timestamps for every stage the job has passed, each a few hours to days after the last."""
+        reached = STAGE_ORDER.index(status)
+        # Roughly a third of the jobs wait for parts before work starts.
+        waits_for_parts = reached >= STAGE_ORDER.index(RepairJob.Stage.PENDING_PART) and self.rng.random() < 0.35
+        moment, times = registered_at, {}
+        for stage, field in STAGE_TIMESTAMPS:
+            if STAGE_ORDER.index(stage) > reached:
+                break
+            moment = min(moment + timedelta(hours=self.rng.randint(2, 120)), self.now)
+            times[field] = moment
+            if field == 'approved_at' and waits_for_parts:
+                moment = min(moment + timedelta(hours=self.rng.randint(1, 24)), self.now)
+                times['parts_pending_at'] = moment
+        return times
+
+    def seed_jobs(self, count, user):
+        owners = Owner.objects.bulk_create(
+            [
+                Owner(name=f'{SEED_PREFIX} Owner {i}', phone_number=f'05{self.rng.randint(10000000, 99999999)}')
+                for i in range(max(count // 3, 1))
+            ],
+            batch_size=self.batch_size,
+        )
+        brands = [code for code, _ in Car.BRAND_CHOICES]
+        colors = [code for code, _ in Car.COLOR_CHOICES]
+        estimates = [code for code, _ in Car.ESTIMATE_COST_CHOICES]
+        cars = Car.objects.bulk_create(
+            [
+                Car(
+                    plate_number=f'{SEED_PREFIX}-{i:07d}',
+                    vin_number=f'{SEED_PREFIX}V{i:012d}',
+                    claim_number=f'CLM-{self.rng.randint(100000, 999999)}',
+                    brand=self.rng.choice(brands),
+                    color=self.rng.choice(colors),
+                    estimated_cost=self.rng.choice(estimates),
+                    year=self.rng.randint(2005, 2025),
+                    owner=self.rng.choice(owners),
+                    registered_at=self.random_moment(),
+                    registered_by=user,
+                )
+                for i in range(count)
+            ],
+            batch_size=self.batch_size,
+        )
+
+        statuses, weights = zip(*STATUS_WEIGHTS)
+        jobs = []
+        for car in cars:
+            status = self.rng.choices(statuses, weights)[0]
+            approved = status not in (
+                RepairJob.Stage.PENDING_EXPERT, RepairJob.Stage.QUOTATION, RepairJob.Stage.PENDING_APPROVAL,
+            )
+            jobs.append(RepairJob(
+                car=car,
+                status=status,
+                deal=Decimal(self.rng.randint(300, 15000)) if approved else None,
+                lpo_confirmed=approved and self.rng.random() < 0.6,
+                sign_confirmed=approved and self.rng.random() < 0.7,
+                **self.stage_times(car.registered_at, status),
+            ))
+        # bulk_create skips RepairJob.save(), so no Income rows are created
+        # here and Car.is_archived is refreshed in one UPDATE afterwards.
+        jobs = RepairJob.objects.bulk_create(jobs, batch_size=self.batch_size)
+        Car.objects.filter(plate_number__startswith=f'{SEED_PREFIX}-').refresh_archive_state()
+        return jobs
+
+    def seed_job_items(self, jobs, user, max_parts, max_quote_items):
+        catalogue = ItemName.objects.bulk_create(
+            [ItemName(name=f'{SEED_PREFIX} {name} {side}') for name in PART_NAMES for side in ('L', 'R', 'F')]
+        )
+        positions = [code for code, _ in QuotationItem.POSITION_CHOICES]
+        working = STAGE_ORDER.index(RepairJob.Stage.WORKING)
+
+        parts, items = [], []
+        for job in jobs:
+            if job.status == RepairJob.Stage.PENDING_EXPERT:
+                continue
+            for _ in range(self.rng.randint(1, max(max_quote_items, 1))):
+                items.append(QuotationItem(
+                    repair_job=job,
+                    item_name=self.rng.choice(catalogue),
+                    price=Decimal(self.rng.randint(50, 2500)),
+                    quantity=self.rng.choice([1, 1, 1, 2]),
+                    position=self.rng.choice(positions),
+                ))
+            if job.approved_at is None:
+                continue
+            for _ in range(self.rng.randint(0, max_parts)):
+                parts.append(Part(
+                    repair_job=job,
+                    name=self.rng.choice(PART_NAMES),
+                    price=Decimal(self.rng.randint(40, 1800)),
+                    is_bought=STAGE_ORDER.index(job.status) >= working or self.rng.random() < 0.3,
+                ))
+        QuotationItem.objects.bulk_create(items, batch_size=self.batch_size)
+        parts = Part.objects.bulk_create(parts, batch_size=self.batch_size)
+
+        Expense.objects.bulk_create(
+            [
+                Expense(
+                    expense_type=Expense.ExpenseType.PART,
+                    description=f'{SEED_PREFIX} part {part.name} for job #{part.repair_job_id}',
+                    amount=-part.price,
+                    transaction_date=part.repair_job.approved_at,
+                    related_part=part,
+                    recorded_by=user,
+                )
+                for part in parts if part.is_bought
+            ],
+            batch_size=self.batch_size,
+        )
+
+    def seed_ledger(self, jobs, user):
+        incomes = Income.objects.bulk_create(
+            [
+                Income(
+                    repair_job=job,
+                    source=f'{SEED_PREFIX} {job.car.plate_number}',
+                    description=f"Deal amount for job #{job.id}",
+                    amount=job.deal,
+                    recorded_by=user,
+                )
+                for job in jobs if job.deal
+            ],
+            batch_size=self.batch_size,
+        )
+        # transaction_date is auto_now_add, so it is spread out after the insert.
+        for income in incomes:
+            income.transaction_date = self.random_moment()
+        Income.objects.bulk_update(incomes, ['transaction_date'], batch_size=self.batch_size)
+
+        category, _ = ExpenseCategory.objects.get_or_create(name=f'{SEED_PREFIX} Rent')
+        Expense.objects.bulk_create(
+            [
+                Expense(
+                    expense_type=self.rng.choice([Expense.ExpenseType.GARAGE, Expense.ExpenseType.OTHER]),
+                    description=f'{SEED_PREFIX} expense {i}',
+                    amount=-Decimal(self.rng.randint(20, 3000)),
+                    transaction_date=self.random_moment(),
+                    category=category,
+                    recorded_by=user,
+                )
+                for i in range(len(incomes) * 2)
+            ],
+            batch_size=self.batch_size,
+        )
+
+    def seed_payroll(self, count, user):
+        employees = Employee.objects.bulk_create([
+            Employee(
+                full_name=f'{SEED_PREFIX} Employee {i}',
+                base_salary=Decimal(self.rng.randint(1500, 6000)),
+                hire_date=(self.now - timedelta(days=self.days)).date(),
+            )
+            for i in range(count)
+        ])
+
+        start = (self.now - timedelta(days=self.days)).date()
+        slips, absences, expenses = [], [], []
+        for employee in employees:
+            period_start = start
+            while period_start <= self.now.date():
+                period_end = period_start + timedelta(days=29)
+                slips.append(SalarySlip(
+                    employee=employee,
+                    pay_period_start=period_start,
+                    pay_period_end=period_end,
+                    extra_h=self.rng.choice([0, 0, 5, 10]),
+                ))
+                period_start = period_end + timedelta(days=1)
+
+            days_off = self.rng.sample(range(self.days), min(self.days, self.rng.randint(5, 25)))
+            absences.extend(
+                Attendance(employee=employee, date=start + timedelta(days=day), reason='Sick leave')
+                for day in days_off
+            )
+            expenses.extend(
+                Expense(
+                    expense_type=Expense.ExpenseType.PERSONAL,
+                    personal_type=self.rng.choice(Expense.PersonalType.values),
+                    description=f'{SEED_PREFIX} personal {employee.id}',
+                    amount=-Decimal(self.rng.randint(50, 500)),
+                    transaction_date=self.random_moment(),
+                    employee=employee,
+                    recorded_by=user,
+                )
+                for _ in range(self.rng.randint(5, 40))
+            )
+
+        SalarySlip.objects.bulk_create(slips, batch_size=self.batch_size)
+        Attendance.objects.bulk_create(absences, batch_size=self.batch_size)
+        Expense.objects.bulk_create(expenses, batch_size=self.batch_size)
@@ -0,0 +1,156 @@
+"""
+پاکسازی تصاویر کارهای آرشیو شده، خارج از مسیر درخواست.
+
+Archived jobs are queued by ``media_purged_at IS NULL``; the sweeper deletes
+their part pictures (and the car image once the car has no open job left)
+together with their thumbnails, clears the fields, records every file in
+``PurgedMedia`` and stamps the job. Running it again only picks up jobs
+archived since the last sweep.
+
+Files live in ``core.storage.ContentAddressedStorage`` and may be shared by
+several rows, so a blob is only deleted by :func:`release` once no field in
+``REFERENCES`` points at it any more.
+"""
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+
+from .models import Car, Part, PurgedMedia, RepairJob
+from .storage import media_storage
+
+DEFAULT_BATCH_SIZE = 200
+
+# هر ستونی که به فایلی در media_storage ارجاع می‌دهد.
+REFERENCES = [
+    (Car, ('image', 'thumbnail')),
+    (Part, ('picture', 'thumbnail')),
+]
+
+
+@dataclass
+class PurgeResult:
+    jobs: int = 0
+    files: int = 0
+    bytes: int = 0
+    names: list = field(default_factory=list)
+
+
+def pending_jobs():
+    """کارهای آرشیو شده‌ای که تصاویرشان هنوز پاکسازی نشده است."""
+    return RepairJob.objects.filter(
+        status=RepairJob.Stage.ARCHIVED, media_purged_at__isnull=True,
+    ).order_by('id')
+
+
+def referenced(names, exclude=None):
+    """
+    The subset of ``names`` still referenced by some row. ``exclude`` maps a
+    model to ids whose references should not count (rows about to be cleared).
+    """
+    names = set(names)
+    found = set()
+    if not names:
+        return found
+    for model, fields in REFERENCES:
+        queryset = model.objects.all()
+        if exclude and exclude.get(model):
+            queryset = queryset.exclude(id__in=exclude[model])
+        for field_name in fields:
+            found.update(queryset.filter(**{f'{field_name}__in': names}).values_list(field_name, flat=True))
+    return found
+
+
+def release(names):
+    """Deletes the blobs among ``names`` that no row references and returns their names."""
+    orphans = sorted(set(names) - referenced(names))
+    for name in orphans:
+        media_storage.delete(name)
+    return orphans
+
+
+def _file_size(name):
+    try:
+        return media_storage.size(name)
+    except OSError:
+        # فایل قبلاً حذف شده (مثلاً اجرای قبلی نیمه‌کاره ماند).
+        return None
+
+
+def _collect(jobs):
+    """Returns the ``(job, file)`` references to clear plus the car and part ids holding them."""
+    car_ids = {job.car_id for job in jobs}
+    # خودرویی که هنوز کار باز دارد، تصویرش را نگه می‌داریم.
+    busy_cars = set(
+        RepairJob.objects.filter(car_id__in=car_ids)
+        .exclude(status=RepairJob.Stage.ARCHIVED)
+        .values_list('car_id', flat=True)
+    )
+
+    files, cleared_cars, cleared_parts = [], set(), []
+    for job in jobs:
+        car = job.car
+        if car.image and car.id not in busy_cars and car.id not in cleared_cars:
+            files.extend((job, file) for file in (car.image, car.thumbnail) if file)
+            cleared_cars.add(car.id)
+        for part in job.parts.all():
+            files.extend((job, file) for file in (part.picture, part.thumbnail) if file)
+            cleared_parts.append(part.id)
+    return files, cleared_cars, cleared_parts
+
+
+def purge_batch(jobs, dry_run=False):
+    """Purges the media of one batch of archived jobs and returns a :class:`PurgeResult`."""
+    files, cleared_cars, cleared_parts = _collect(jobs)
+    names = {file.name for _, file in files}
+    sizes = {name: _file_size(name) for name in names}
+    records = [PurgedMedia(repair_job=job, name=file.name, size=sizes[file.name]) for job, file in files]
+
+    if dry_run:
+        orphans = sorted(names - referenced(names, exclude={Car: cleared_cars, Part: cleared_parts}))
+        return PurgeResult(
+            jobs=len(jobs), files=len(orphans), bytes=sum(sizes[name] or 0 for name in orphans), names=orphans,
+        )
+
+    now = timezone.now()
+    with transaction.atomic():
+        if cleared_cars:
+            Car.objects.filter(id__in=cleared_cars).update(image='', thumbnail='')
+        if cleared_parts:
+            Part.objects.filter(id__in=cleared_parts).update(picture='', thumbnail='')
+        for record in records:
+            record.purged_at = now
+        PurgedMedia.objects.bulk_create(records)
+        RepairJob.objects.filter(id__in=[job.id for job in jobs]).update(media_purged_at=now)
+        # تصویر خودرو در صفحه همه کارهای آن خودرو دیده می‌شود.
+        RepairJob.objects.filter(Q(id__in=[job.id for job in jobs]) | Q(car_id__in=cleared_cars)).bump_detail_version()
+
+    # فایل‌ها پس از ثبت تراکنش حذف می‌شوند و فقط آن‌هایی که دیگر ارجاعی ندارند؛
+    # اگر این مرحله نیمه‌کاره بماند، تنها فایل بی‌صاحب روی دیسک می‌ماند.
+    orphans = release(names)
+    return PurgeResult(
+        jobs=len(jobs), files=len(orphans), bytes=sum(sizes[name] or 0 for name in orphans), names=orphans,
+    )
+
+
+def purge_archived_media(batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    """Sweeps every pending archived job in id order, ``batch_size`` jobs at a time."""
+    parts = Part.objects.exclude(picture='').exclude(picture__isnull=True).only('id', 'picture', 'thumbnail', 'repair_job_id')
+    queryset = pending_jobs().select_related('car').only(
+        'id', 'car__id', 'car__image', 'car__thumbnail',
+    ).prefetch_related(Prefetch('parts', queryset=parts))
+
+    total = PurgeResult()
+    last_id = 0
+    while True:
+        jobs = list(queryset.filter(id__gt=last_id)[:batch_size])
+        if not jobs:
+            break
+        last_id = jobs[-1].id
+        result = purge_batch(jobs, dry_run=dry_run)
+        total.jobs += result.jobs
+        total.files += result.files
+        total.bytes += result.bytes
+        total.names.extend(result.names)
+    return total
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 00:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_alter_repairjob_options_alter_repairjob_car_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['registered_at', 'id'], name='core_car_registered_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repairjob',
+            index=models.Index(condition=models.Q(('status', 'archived'), _negated=True), fields=['car'], name='core_job_active_car_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repairjob',
+            index=models.Index(fields=['status'], name='core_job_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repairjob',
+            index=models.Index(fields=['approved_at', 'id'], name='core_job_approved_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:01
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_car_search_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PurgedMedia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, verbose_name='File Name')),
+                ('size', models.PositiveBigIntegerField(blank=True, null=True, verbose_name='Size (bytes)')),
+                ('purged_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Purged At')),
+            ],
+            options={
+                'verbose_name': 'Purged Media',
+                'verbose_name_plural': 'Purged Media',
+            },
+        ),
+        migrations.AddField(
+            model_name='repairjob',
+            name='media_purged_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Media Purged At'),
+        ),
+        migrations.AddIndex(
+            model_name='repairjob',
+            index=models.Index(condition=models.Q(('media_purged_at__isnull', True), ('status', 'archived')), fields=['id'], name='core_job_media_pending_idx'),
+        ),
+        migrations.AddField(
+            model_name='purgedmedia',
+            name='repair_job',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='purged_media', to='core.repairjob', verbose_name='Repair Job'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_repairjob_media_purge'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='car',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='car_pictures/thumbs/'),
+        ),
+        migrations.AddField(
+            model_name='part',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='parts/thumbs/'),
+        ),
+    ]
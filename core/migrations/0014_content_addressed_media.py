@@ -0,0 +1,52 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:05
+
+import core.storage
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_image_thumbnails'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='car',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.ContentAddressedStorage(), upload_to='car_pictures/'),
+        ),
+        migrations.AlterField(
+            model_name='car',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, storage=core.storage.ContentAddressedStorage(), upload_to='car_pictures/thumbs/'),
+        ),
+        migrations.AlterField(
+            model_name='part',
+            name='picture',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.ContentAddressedStorage(), upload_to='parts/', verbose_name='Part Picture'),
+        ),
+        migrations.AlterField(
+            model_name='part',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, storage=core.storage.ContentAddressedStorage(), upload_to='parts/thumbs/'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['image'], name='core_car_image_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['thumbnail'], name='core_car_thumbnail_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='part',
+            index=models.Index(fields=['picture'], name='core_part_picture_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='part',
+            index=models.Index(fields=['thumbnail'], name='core_part_thumbnail_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:06
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def backfill_archive_state(apps, schema_editor):
+    Car = apps.get_model('core', 'Car')
+    RepairJob = apps.get_model('core', 'RepairJob')
+    open_jobs = RepairJob.objects.filter(car=OuterRef('pk')).exclude(status='archived')
+    Car.objects.update(is_archived=~Exists(open_jobs))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_content_addressed_media'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='car',
+            name='is_archived',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Archived'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['is_archived', 'registered_at', 'id'], name='core_car_archive_state_idx'),
+        ),
+        migrations.RunPython(backfill_archive_state, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:32
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_car_is_archived'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='car',
+            index=django.contrib.postgres.indexes.BTreeIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('plate_number'), name='text_pattern_ops'), name='core_car_plate_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='itemname',
+            index=django.contrib.postgres.indexes.BTreeIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='text_pattern_ops'), name='core_itemname_prefix_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_autocomplete_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repairjob',
+            name='detail_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -1,19 +1,53 @@
-from django.db import models
+from django.contrib.postgres.indexes import BTreeIndex, GinIndex, OpClass
+from django.db import models, transaction
+from django.db.models import Exists, ExpressionWrapper, F, OuterRef, Q, Value
+from django.db.models.functions import Upper
 from django.utils import timezone
 from datetime import timedelta
+from decimal import Decimal
 from django.contrib.auth.models import User
 from markdownx.models import MarkdownxField
 
+from . import images
+from .storage import media_storage
+
+
+def thumbnail_url(image, thumbnail):
+    """آدرس تصویر بندانگشتی؛ تا وقتی ساخته نشده، خود تصویر اصلی."""
+    if thumbnail:
+        return thumbnail.url
+    return image.url if image else ''
+
 class Owner(models.Model):
     name = models.CharField(max_length=50, verbose_name="Name", default='Unnamed Owner')
     phone_number = models.CharField(max_length=30, verbose_name="Phone Number")
     class Meta:
         verbose_name = "Owner"
         verbose_name_plural = "Owners"
+        indexes = [
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='core_owner_name_trgm'),
+            GinIndex(OpClass(Upper('phone_number'), name='gin_trgm_ops'), name='core_owner_phone_trgm'),
+        ]
 
     def __str__(self):
         return f"{self.name}"
     
+class CarQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(is_archived=False)
+
+    def archived(self):
+        return self.filter(is_archived=True)
+
+    def refresh_archive_state(self):
+        """
+        وضعیت آرشیو خودروها را از روی کارهایشان دوباره محاسبه می‌کند.
+        A car is archived once none of its jobs is open; one UPDATE for the whole queryset.
+        """
+        open_jobs = RepairJob.objects.filter(car=OuterRef('pk')).exclude(status=RepairJob.Stage.ARCHIVED)
+        return self.update(is_archived=~Exists(open_jobs))
+
+
 class Car(models.Model):
     """Stores permanent information about a physical car."""
     ESTIMATE_COST_CHOICES = [
@@ -76,7 +110,8 @@ class Car(models.Model):
 
     brand = models.CharField(max_length=50, verbose_name="Brand", choices=BRAND_CHOICES, default='OTHER')
     model =models.CharField(max_length=50, verbose_name="Model", default='N/A')
-    image = models.ImageField(upload_to='car_pictures/', null=True, blank=True)
+    image = models.ImageField(upload_to='car_pictures/', storage=media_storage, null=True, blank=True)
+    thumbnail = models.ImageField(upload_to='car_pictures/thumbs/', storage=media_storage, null=True, blank=True, editable=False)
     owner = models.ForeignKey(Owner, on_delete=models.SET_NULL, null=True, blank=True, related_name='cars')
     plate_number = models.CharField(max_length=20, unique=True, verbose_name="Plate Number")
     color = models.CharField(max_length=20, verbose_name="Color", choices=COLOR_CHOICES, default='WHITE')    
@@ -92,14 +127,76 @@ class Car(models.Model):
         default="mid",
         verbose_name="Estimated Cost Level"
     )
+    # کپی وضعیت کارها؛ RepairJob.save و حذف کار آن را به‌روز نگه می‌دارند.
+    is_archived = models.BooleanField(default=False, editable=False, verbose_name="Archived")
+
+    objects = CarQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['registered_at', 'id'], name='core_car_registered_idx'),
+            models.Index(fields=['is_archived', 'registered_at', 'id'], name='core_car_archive_state_idx'),
+            # core.media.release پیش از حذف هر فایل، ارجاع‌های باقی‌مانده را با این دو می‌شمارد.
+            models.Index(fields=['image'], name='core_car_image_idx'),
+            models.Index(fields=['thumbnail'], name='core_car_thumbnail_idx'),
+            # Trigram indexes over UPPER(...) serve both icontains filters and
+            # the ranked search in core/search.py.
+            GinIndex(OpClass(Upper('plate_number'), name='gin_trgm_ops'), name='core_car_plate_trgm'),
+            GinIndex(OpClass(Upper('claim_number'), name='gin_trgm_ops'), name='core_car_claim_trgm'),
+            GinIndex(OpClass(Upper('vin_number'), name='gin_trgm_ops'), name='core_car_vin_trgm'),
+            # The autocomplete's istartswith (UPPER(...) LIKE 'Q%') at any prefix length.
+            BTreeIndex(OpClass(Upper('plate_number'), name='text_pattern_ops'), name='core_car_plate_prefix_idx'),
+        ]
 
     def __str__(self):
         return f"{self.brand} - {self.plate_number}"
-    
+
+    def save(self, *args, **kwargs):
+        # تصویر تازه آپلود شده فشرده و بندانگشتی آن ساخته می‌شود.
+        images.ingest(self, 'image', 'thumbnail')
+        if self._state.adding:
+            super().save(*args, **kwargs)
+            return
+        # اطلاعات خودرو در صفحه همه کارهای آن نمایش داده می‌شود.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            RepairJob.objects.filter(car_id=self.id).bump_detail_version()
+
     @property
-    def is_archived(self):
-        return not self.jobs.filter(is_archived=False).exists()
+    def thumbnail_url(self):
+        return thumbnail_url(self.image, self.thumbnail)
     
+
+# نرخ مالیات بر ارزش افزوده که روی مبلغ deal اعمال می‌شود.
+VAT_RATE = Decimal('0.05')
+
+
+class RepairJobQuerySet(models.QuerySet):
+    def delete(self):
+        """پس از حذف کارها، وضعیت آرشیو خودروهایشان یکجا به‌روز می‌شود."""
+        car_ids = set(self.values_list('car_id', flat=True))
+        with transaction.atomic():
+            deleted = super().delete()
+            Car.objects.filter(id__in=car_ids).refresh_archive_state()
+        return deleted
+
+    def bump_detail_version(self):
+        """
+        نسخه صفحه جزئیات این کارها را یکی بالا می‌برد تا قطعه‌های کش شده آن دوباره رندر شوند.
+        For writes that change what job_detail shows without RepairJob.save.
+        """
+        return self.update(detail_version=F('detail_version') + 1)
+
+    def with_vat(self):
+        """مالیات (vat) و مبلغ کل (total) هر کار را در خود کوئری محاسبه می‌کند."""
+        money = models.DecimalField(max_digits=12, decimal_places=2)
+        return self.annotate(
+            vat=ExpressionWrapper(F('deal') * Value(VAT_RATE), output_field=money),
+        ).annotate(
+            total=ExpressionWrapper(F('deal') + F('vat'), output_field=money),
+        )
+
+
 class RepairJob(models.Model):
     """یک فرآیند تعمیر از ابتدا تا انتها را برای یک خودرو پیگیری می‌کند."""
     class Stage(models.TextChoices):
@@ -132,32 +229,102 @@ class RepairJob(models.Model):
 
     lpo_confirmed = models.BooleanField(default=False, verbose_name="LPO Confirmed")
     sign_confirmed = models.BooleanField(default=False, verbose_name="Sign Confirmed")
+    # زمانی که purge_archived_media تصاویر این کار آرشیو شده را پاک کرد.
+    media_purged_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Media Purged At")
+    # کلید کش صفحه جزئیات کار؛ با هر تغییری که در آن صفحه دیده می‌شود بالا می‌رود.
+    detail_version = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = RepairJobQuerySet.as_manager()
     
     def __str__(self):
         return f"Job for {self.car} - {self.get_status_display()}"
 
+    # مقدار این فیلدها هنگام بارگذاری نگه داشته می‌شود تا save بداند
+    # درآمد یا وضعیت آرشیو خودرو باید به‌روز شود یا نه.
+    TRACKED_FIELDS = ('deal', 'status')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_loaded(instance.TRACKED_FIELDS)
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._remember_loaded(kwargs.get('fields') or self.TRACKED_FIELDS)
+
+    def _remember_loaded(self, fields):
+        for name in self.TRACKED_FIELDS:
+            if name in fields and name in self.__dict__:
+                setattr(self, f'_loaded_{name}', getattr(self, name))
+
+    @property
+    def deal_changed(self):
+        """True if ``deal`` differs from the value in the database (always for new jobs)."""
+        return self._state.adding or not hasattr(self, '_loaded_deal') or self.deal != self._loaded_deal
+
+    @property
+    def archive_state_changed(self):
+        """True if this save moves the job into or out of the archive (always for new jobs)."""
+        if self._state.adding or not hasattr(self, '_loaded_status'):
+            return True
+        archived = self.Stage.ARCHIVED
+        return (self.status == archived) != (self._loaded_status == archived)
+
     def save(self, *args, **kwargs):
         """
         متد save بازنویسی شده تا درآمد را به صورت خودکار بر اساس مبلغ deal ثبت کند.
+        Income is only synced when ``deal`` actually changed, and the car's
+        ``is_archived`` only when the job enters or leaves the archive, so
+        ordinary saves cost a single UPDATE, which also bumps
+        ``detail_version``.
         """
         from accounting.models import Income
 
-        super().save(*args, **kwargs)
-
-        if self.deal and self.deal > 0:
-            Income.objects.update_or_create(
-                repair_job=self,
-                defaults={
-                    'description': f"Approved deal for {self.car}",
-                    'amount': self.deal,
-                    'recorded_by': self.car.registered_by
-                }
-            )
-        elif self.deal is None or self.deal <= 0:
-            Income.objects.filter(repair_job=self).delete()
-            
+        update_fields = kwargs.get('update_fields')
+        sync_income = self.deal_changed and (update_fields is None or 'deal' in update_fields)
+        sync_archive = self.archive_state_changed and (update_fields is None or 'status' in update_fields)
+        bump_version = not self._state.adding
+        if bump_version:
+            # نسخه صفحه در همان UPDATE بالا می‌رود.
+            self.detail_version = F('detail_version') + 1
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'detail_version'}
+
+        if sync_income or sync_archive:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                if sync_income:
+                    Income.objects.sync_for_jobs([self])
+                if sync_archive:
+                    Car.objects.filter(id=self.car_id).refresh_archive_state()
+            self._remember_loaded(self.TRACKED_FIELDS)
+        else:
+            super().save(*args, **kwargs)
+
+        if bump_version:
+            # Left unloaded, so the next read fetches the new number.
+            del self.__dict__['detail_version']
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            deleted = super().delete(*args, **kwargs)
+            Car.objects.filter(id=self.car_id).refresh_archive_state()
+        return deleted
+
     class Meta:
         ordering = ['-car__registered_at']
+        indexes = [
+            # لیست خودروها همیشه کارهای آرشیو شده را کنار می‌گذارد.
+            models.Index(fields=['car'], condition=~Q(status='archived'), name='core_job_active_car_idx'),
+            models.Index(fields=['status'], name='core_job_status_idx'),
+            models.Index(fields=['approved_at', 'id'], name='core_job_approved_idx'),
+            # صف کار purge_archived_media: کارهای آرشیو شده‌ای که هنوز پاکسازی نشده‌اند.
+            models.Index(
+                fields=['id'], condition=Q(status='archived', media_purged_at__isnull=True),
+                name='core_job_media_pending_idx',
+            ),
+        ]
         permissions = [
             ("can_manage_repair_dashboard", "Can manage repair dashboard"),
         ]
@@ -166,10 +333,33 @@ class Part(models.Model):
     """Represents a single required part with its picture for a repair job."""
     repair_job = models.ForeignKey(RepairJob, on_delete=models.CASCADE, related_name="parts", verbose_name="Repair Job")
     name = models.CharField(max_length=200, verbose_name="Part Name")
-    picture = models.ImageField(upload_to="parts/", verbose_name="Part Picture", null=True, blank=True)
+    picture = models.ImageField(upload_to="parts/", storage=media_storage, verbose_name="Part Picture", null=True, blank=True)
+    thumbnail = models.ImageField(upload_to="parts/thumbs/", storage=media_storage, null=True, blank=True, editable=False)
     price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Part Price", default=10.00)
     is_bought = models.BooleanField(default=False, verbose_name="Is Bought?")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['picture'], name='core_part_picture_idx'),
+            models.Index(fields=['thumbnail'], name='core_part_thumbnail_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        images.ingest(self, 'picture', 'thumbnail')
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            RepairJob.objects.filter(id=self.repair_job_id).bump_detail_version()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            deleted = super().delete(*args, **kwargs)
+            RepairJob.objects.filter(id=self.repair_job_id).bump_detail_version()
+        return deleted
+
+    @property
+    def thumbnail_url(self):
+        return thumbnail_url(self.picture, self.thumbnail)
+
     def __str__(self):
         if self.repair_job:
             return f"{self.name} for Job #{self.repair_job.id}"
@@ -178,9 +368,26 @@ class Part(models.Model):
 class ItemName(models.Model):
     name = models.CharField(max_length=200, unique=True)
 
+    class Meta:
+        indexes = [
+            # جستجوی پیشوندی autocomplete نام آیتم‌ها (istartswith).
+            BTreeIndex(OpClass(Upper('name'), name='text_pattern_ops'), name='core_itemname_prefix_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # نام آیتم در پیش‌فاکتور کارهایی که از آن استفاده کرده‌اند نمایش داده می‌شود.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            RepairJob.objects.filter(quotation_items__item_name=self).bump_detail_version()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            RepairJob.objects.filter(quotation_items__item_name=self).bump_detail_version()
+            return super().delete(*args, **kwargs)
+
 class QuotationItem(models.Model):
     POSITION_CHOICES = [
         ('front', 'Front'),
@@ -208,5 +415,31 @@ class QuotationItem(models.Model):
     def amount(self):
         return self.quantity * self.price
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            RepairJob.objects.filter(id=self.repair_job_id).bump_detail_version()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            deleted = super().delete(*args, **kwargs)
+            RepairJob.objects.filter(id=self.repair_job_id).bump_detail_version()
+        return deleted
+
     def __str__(self):
         return f"Quote Item: {self.display_name} x{self.quantity} for Job #{self.repair_job.id}"
+
+
+class PurgedMedia(models.Model):
+    """A car image or part picture deleted by ``purge_archived_media`` after its job was archived."""
+    repair_job = models.ForeignKey(RepairJob, on_delete=models.CASCADE, related_name="purged_media", verbose_name="Repair Job")
+    name = models.CharField(max_length=255, verbose_name="File Name")
+    size = models.PositiveBigIntegerField(null=True, blank=True, verbose_name="Size (bytes)")
+    purged_at = models.DateTimeField(default=timezone.now, verbose_name="Purged At")
+
+    class Meta:
+        verbose_name = "Purged Media"
+        verbose_name_plural = "Purged Media"
+
+    def __str__(self):
+        return f"{self.name} (Job #{self.repair_job_id})"
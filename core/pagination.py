@@ -0,0 +1,98 @@
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+PER_PAGE = 25
+
+
+class KeysetPage:
+    """
+    A page produced by seek pagination.
+
+    It doesn't know the total row count, only whether a next page exists.
+    ``previous_query`` links back to the first page.
+    """
+
+    def __init__(self, object_list, next_query=None, first_query=None):
+        self.object_list = object_list
+        self.next_query = next_query
+        self.previous_query = first_query
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_query is not None
+
+    def has_previous(self):
+        return self.previous_query is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def _querystring(request, param, value=None):
+    query = request.GET.copy()
+    if value is None:
+        query.pop(param, None)
+    else:
+        query[param] = value
+    return query.urlencode()
+
+
+def _resolve(obj, path):
+    for attr in path.split('__'):
+        obj = getattr(obj, attr)
+    return obj
+
+
+def _parse_cursor(cursor):
+    try:
+        value, pk = cursor.rsplit('|', 1)
+        return parse_datetime(value), int(pk)
+    except (AttributeError, ValueError, TypeError):
+        return None
+
+
+def keyset_page(request, queryset, ordering, per_page=PER_PAGE, param='after'):
+    """
+    Seek pagination over ``ordering``, a ``(datetime field, pk field)`` pair
+    that is either fully ascending or fully descending, e.g.
+    ``('-car__registered_at', '-id')``.
+
+    The next page is requested with ``?<param>=<value>|<pk>`` of the last row
+    shown, so the database seeks straight to it instead of scanning OFFSET rows.
+    """
+    field, pk_field = (name.lstrip('-') for name in ordering)
+    lookup = 'lt' if ordering[0].startswith('-') else 'gt'
+    queryset = queryset.order_by(*ordering)
+
+    cursor = _parse_cursor(request.GET.get(param))
+    if cursor and cursor[0] is not None:
+        value, pk = cursor
+        queryset = queryset.filter(
+            Q(**{f'{field}__{lookup}': value})
+            | Q(**{field: value, f'{pk_field}__{lookup}': pk})
+        )
+
+    rows = list(queryset[:per_page + 1])
+    next_query = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_query = _querystring(
+            request, param, f"{_resolve(last, field).isoformat()}|{_resolve(last, pk_field)}"
+        )
+    first_query = _querystring(request, param) if cursor else None
+    return KeysetPage(rows, next_query, first_query)
+
+
+def offset_page(request, queryset, per_page=PER_PAGE, param='page'):
+    """Classic numbered pagination, for orderings that keyset paging can't seek on."""
+    page = Paginator(queryset, per_page).get_page(request.GET.get(param))
+    page.previous_query = _querystring(request, param, page.previous_page_number()) if page.has_previous() else None
+    page.next_query = _querystring(request, param, page.next_page_number()) if page.has_next() else None
+    return page
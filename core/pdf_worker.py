@@ -0,0 +1,85 @@
+"""
+Runs inside the PDF worker processes.
+
+Kept free of Django imports: workers are spawned fresh and only need the
+rendered HTML, so they never set up Django or open database connections.
+``init_worker`` loads fonts, stylesheets and static files once per process;
+every later ``render_pdf`` call reuses them.
+"""
+import mimetypes
+import os
+from pathlib import Path
+
+from weasyprint import CSS, HTML
+from weasyprint.text.fonts import FontConfiguration
+from weasyprint.urls import URLFetcher, URLFetcherResponse
+
+# Documents are rendered against this base URL, so "/static/..." references
+# never go out over HTTP but are answered from disk by StaticFetcher.
+BASE_URL = 'http://pdf-assets.invalid'
+
+_renderer = None
+
+
+class StaticFetcher(URLFetcher):
+    """Serves static files from the static roots, reading each file once per process."""
+
+    def __init__(self, static_url, static_roots):
+        super().__init__()
+        self.prefix = BASE_URL + static_url
+        self.roots = [Path(root) for root in static_roots]
+        self.files = {}
+
+    def fetch(self, url, headers=None):
+        if not url.startswith(self.prefix):
+            return super().fetch(url, headers)
+
+        relative = url[len(self.prefix):].split('?')[0]
+        if relative not in self.files:
+            self.files[relative] = self.read(relative)
+        body, content_type = self.files[relative]
+        return URLFetcherResponse(url, body, {'Content-Type': content_type})
+
+    def read(self, relative):
+        for root in self.roots:
+            path = root / relative
+            if path.is_file():
+                return path.read_bytes(), mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+        raise FileNotFoundError(relative)
+
+
+class Renderer:
+    def __init__(self, static_url, static_roots, stylesheets):
+        self.font_config = FontConfiguration()
+        self.fetcher = StaticFetcher(static_url, static_roots)
+        # Decoded images, shared by every document this process renders.
+        self.image_cache = {}
+        self.stylesheets = {
+            name: CSS(url=BASE_URL + static_url + path, url_fetcher=self.fetcher, font_config=self.font_config)
+            for name, path in stylesheets.items()
+        }
+
+    def write_pdf(self, html, stylesheet, target):
+        document = HTML(string=html, base_url=BASE_URL + '/', url_fetcher=self.fetcher)
+        return document.write_pdf(
+            target,
+            stylesheets=[self.stylesheets[stylesheet]],
+            font_config=self.font_config,
+            cache=self.image_cache,
+        )
+
+
+def init_worker(static_url, static_roots, stylesheets):
+    """Process pool initializer: builds this process's warm renderer."""
+    global _renderer
+    _renderer = Renderer(static_url, static_roots, stylesheets)
+
+
+def render_pdf(html, stylesheet, path):
+    """Renders ``html`` with the named stylesheet and atomically writes the PDF to ``path``."""
+    if _renderer is None:
+        raise RuntimeError("init_worker() must run before render_pdf().")
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    _renderer.write_pdf(html, stylesheet, tmp_path)
+    os.replace(tmp_path, path)
+    return str(path)
@@ -0,0 +1,271 @@
+import functools
+import hashlib
+import multiprocessing
+import os
+import threading
+import zipfile
+from datetime import datetime, time, timedelta
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from time import monotonic
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.template.loader import render_to_string
+from django.utils import timezone
+from pypdf import PdfWriter
+
+from .models import RepairJob, VAT_RATE
+from .pdf_worker import init_worker, render_pdf
+
+QUOTATION_TEMPLATE = 'reports/quotation_pdf_custom.html'
+CAR_OWNER_TEMPLATE = 'reports/car_owner_pdf.html'
+
+# Stylesheet of each kind of document, parsed once per worker process.
+STYLESHEETS = {
+    'quotation': 'core/css/pdf_quotation.css',
+    'car_owner': 'core/css/pdf_car_owner.css',
+}
+
+# Bump to invalidate every cached PDF, e.g. after a WeasyPrint upgrade.
+RENDERER_VERSION = '1'
+
+# Upper bound on the quotations one batch export renders inside a web request;
+# larger exports go through the export_quotations command.
+BATCH_LIMIT = 100
+
+# How long a superseded PDF is kept after it was last handed out; see prune_cache.
+PRUNE_GRACE = timedelta(hours=1)
+
+_executor = None
+_lock = threading.Lock()
+_in_flight = {}
+
+
+def static_roots():
+    """Directories a "/static/..." URL in a PDF can be served from."""
+    roots = [str(path) for path in settings.STATICFILES_DIRS]
+    roots += [
+        str(Path(app.path) / 'static') for app in apps.get_app_configs()
+        if (Path(app.path) / 'static').is_dir()
+    ]
+    if getattr(settings, 'STATIC_ROOT', None):
+        roots.append(str(settings.STATIC_ROOT))
+    return roots
+
+
+def worker_args():
+    return settings.STATIC_URL, static_roots(), STYLESHEETS
+
+
+@functools.lru_cache
+def _stylesheet_digest(kind):
+    return hashlib.sha256(Path(finders.find(STYLESHEETS[kind])).read_bytes()).hexdigest()
+
+
+def _pool(workers=None):
+    """The shared worker pool; ``workers`` (default PDF_RENDER_WORKERS) sizes it when this call starts it."""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=workers or settings.PDF_RENDER_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker,
+                initargs=worker_args(),
+            )
+        return _executor
+
+
+def _reset_pool():
+    global _executor
+    with _lock:
+        _executor = None
+        _in_flight.clear()
+
+
+class PdfArtifact:
+    """
+    One PDF to render: the HTML it is rendered from and where it is cached.
+
+    The cache key is a hash of the rendered HTML and the document's
+    stylesheet. The HTML already covers the job, its quotation items and the
+    template source, so any change to what the PDF shows produces a new file
+    and an unchanged job is served as is.
+    """
+
+    def __init__(self, kind, object_id, html, filename):
+        self.kind = kind
+        self.object_id = object_id
+        self.html = html
+        self.filename = filename
+        digest = hashlib.sha256(
+            '\0'.join([RENDERER_VERSION, _stylesheet_digest(kind), html]).encode('utf-8')
+        ).hexdigest()[:32]
+        self.path = Path(settings.PDF_CACHE_DIR) / kind / f'{object_id}_{digest}.pdf'
+
+    def is_cached(self):
+        return self.path.exists()
+
+    def submit(self):
+        """Queues the render in the worker pool, unless it's cached or already queued."""
+        key = str(self.path)
+        with _lock:
+            future = _in_flight.get(key)
+        if future is not None or self.is_cached():
+            return future
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            future = _pool().submit(render_pdf, self.html, self.kind, key)
+        except BrokenProcessPool:
+            _reset_pool()
+            future = _pool().submit(render_pdf, self.html, self.kind, key)
+        with _lock:
+            _in_flight[key] = future
+        future.add_done_callback(lambda done: self._finished(key))
+        return future
+
+    def _finished(self, key):
+        # Earlier versions of the document may still be open in another
+        # request; prune_cache removes them once they have gone unused.
+        with _lock:
+            _in_flight.pop(key, None)
+
+    def wait(self, timeout=None):
+        """
+        Returns the path of the rendered PDF, waiting up to ``timeout`` seconds
+        for the worker pool. Returns None if it isn't ready in time.
+        """
+        future = self.submit()
+        if future is not None:
+            try:
+                future.result(timeout=timeout)
+            except TimeoutError:
+                return None
+            except BrokenProcessPool:
+                _reset_pool()
+                raise
+        try:
+            # Marks the file as in use, so prune_cache keeps it a while longer.
+            os.utime(self.path)
+        except FileNotFoundError:
+            # Pruned between the cache check and now; render it again.
+            return self.wait(timeout)
+        return self.path
+
+
+def prune_cache(grace=PRUNE_GRACE):
+    """
+    Deletes cached PDFs that have not been handed out for ``grace``, except
+    the most recently used version of each document. Returns how many were deleted.
+    """
+    cutoff = timezone.now().timestamp() - grace.total_seconds()
+    deleted = 0
+    for kind in STYLESHEETS:
+        versions = {}
+        for path in (Path(settings.PDF_CACHE_DIR) / kind).glob('*_*.pdf'):
+            try:
+                versions.setdefault(path.name.split('_', 1)[0], []).append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue
+        for files in versions.values():
+            files.sort()
+            for modified, path in files[:-1]:
+                if modified < cutoff:
+                    path.unlink(missing_ok=True)
+                    deleted += 1
+    return deleted
+
+
+def quotation_context(job):
+    # Uses the prefetched items when the caller loaded them with QUOTATION_PREFETCH,
+    # and otherwise fetches them with their item names in one query.
+    items = job.quotation_items.all()
+    if 'quotation_items' not in getattr(job, '_prefetched_objects_cache', {}):
+        items = items.select_related('item_name')
+    items = list(items)
+
+    sub_total = sum(item.amount for item in items)
+    tax_due = sub_total * VAT_RATE
+    return {
+        'job': job,
+        'items': items,
+        'sub_total': sub_total,
+        'tax_rate': int(VAT_RATE * 100),
+        'tax_due': tax_due,
+        'total_final': sub_total + tax_due,
+    }
+
+
+QUOTATION_PREFETCH = 'quotation_items__item_name'
+
+
+def quotation_pdf(job):
+    return PdfArtifact(
+        'quotation', job.id,
+        render_to_string(QUOTATION_TEMPLATE, quotation_context(job)),
+        f'quotation_{job.car.plate_number}.pdf',
+    )
+
+
+def car_owner_pdf(car):
+    return PdfArtifact(
+        'car_owner', car.id,
+        render_to_string(CAR_OWNER_TEMPLATE, {'car': car, 'owner': car.owner}),
+        f'car_details_{car.plate_number}.pdf',
+    )
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def quotation_batch_jobs(status=None, start_date=None, end_date=None, claim_numbers=None):
+    """Jobs picked for a batch export, ready to render without further queries per job."""
+    jobs = RepairJob.objects.select_related('car__owner').prefetch_related(QUOTATION_PREFETCH)
+    if status:
+        jobs = jobs.filter(status=status)
+    if start_date:
+        jobs = jobs.filter(car__registered_at__gte=_day_start(start_date))
+    if end_date:
+        jobs = jobs.filter(car__registered_at__lt=_day_start(end_date) + timedelta(days=1))
+    if claim_numbers:
+        jobs = jobs.filter(car__claim_number__in=claim_numbers)
+    return jobs.order_by('car__registered_at', 'id')
+
+
+def render_batch(jobs, timeout=None, workers=None):
+    """
+    Renders the quotation of every job, in parallel across the worker pool.
+    Cached quotations are not rendered again. Returns ``(job, artifact)`` pairs.
+    ``workers`` sizes the pool if it hasn't been started yet in this process.
+    ``timeout`` bounds the whole batch; on TimeoutError the remaining renders
+    keep running in the pool and are cached for the next attempt.
+    """
+    _pool(workers)
+    deadline = None if timeout is None else monotonic() + timeout
+    batch = [(job, quotation_pdf(job)) for job in jobs]
+    for _, artifact in batch:
+        artifact.submit()
+    for _, artifact in batch:
+        remaining = None if deadline is None else max(deadline - monotonic(), 0)
+        if artifact.wait(timeout=remaining) is None:
+            raise TimeoutError(f"Rendering the batch took longer than {timeout} seconds.")
+    return batch
+
+
+def write_zip(batch, fileobj):
+    # PDFs are already compressed; storing them keeps the archive fast to build.
+    with zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for job, artifact in batch:
+            archive.write(artifact.path, f'{job.id}_{artifact.filename}')
+
+
+def write_merged_pdf(batch, fileobj):
+    writer = PdfWriter()
+    for job, artifact in batch:
+        writer.append(str(artifact.path), outline_item=f'#{job.id} {job.car.plate_number}')
+    writer.write(fileobj)
@@ -0,0 +1,168 @@
+"""
+پروفایل سبک درخواست‌ها: تعداد و زمان کوئری‌ها، زمان رندر قالب و زمان کل.
+
+Enabled with ``PROFILING_ENABLED``. Each request is recorded, tagged by its
+resolved URL name, into an in-process ring buffer that staff can read at
+``core:profiling``. SQL statements are reduced to their shape (parameters are
+already placeholders; ``IN`` lists are collapsed), and a shape repeated at
+least ``PROFILING_REPEAT_THRESHOLD`` times in one request is flagged as a
+likely N+1 and logged as a warning.
+
+The buffer is per process: with several workers each keeps its own.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import Template as DjangoTemplate
+
+logger = logging.getLogger(__name__)
+
+# لیست‌های IN با تعداد متفاوت پارامتر، یک شکل حساب می‌شوند.
+_PLACEHOLDER_LIST = re.compile(r'%s(?:\s*,\s*%s)+')
+
+_buffer = deque(maxlen=settings.PROFILING_BUFFER_SIZE)
+_buffer_lock = threading.Lock()
+
+# پروفایل درخواست جاری؛ رندر قالب زمان خود را روی آن می‌نویسد.
+_current = ContextVar('profile', default=None)
+
+
+@dataclass
+class RequestProfile:
+    url_name: str = ''
+    method: str = ''
+    path: str = ''
+    status: int = 0
+    started_at: float = 0.0
+    total_ms: float = 0.0
+    sql_count: int = 0
+    sql_ms: float = 0.0
+    template_ms: float = 0.0
+    shapes: Counter = field(default_factory=Counter)
+    repeated: list = field(default_factory=list)
+    rendering: bool = False
+
+    def record_query(self, sql, duration):
+        self.sql_count += 1
+        self.sql_ms += duration * 1000
+        self.shapes[sql_shape(sql)] += 1
+
+
+def sql_shape(sql):
+    return _PLACEHOLDER_LIST.sub('%s', sql)
+
+
+def recent():
+    """Recorded profiles, newest first."""
+    with _buffer_lock:
+        return list(reversed(_buffer))
+
+
+def summary(profiles):
+    """Per URL name: request count, mean/max latency and SQL, and N+1 flags."""
+    groups = {}
+    for profile in profiles:
+        group = groups.setdefault(profile.url_name, {
+            'url_name': profile.url_name, 'requests': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+            'sql_count': 0, 'sql_ms': 0.0, 'template_ms': 0.0, 'flagged': 0,
+        })
+        group['requests'] += 1
+        group['total_ms'] += profile.total_ms
+        group['max_ms'] = max(group['max_ms'], profile.total_ms)
+        group['sql_count'] += profile.sql_count
+        group['sql_ms'] += profile.sql_ms
+        group['template_ms'] += profile.template_ms
+        group['flagged'] += bool(profile.repeated)
+
+    rows = []
+    for group in groups.values():
+        count = group['requests']
+        for key in ('total_ms', 'sql_count', 'sql_ms', 'template_ms'):
+            group[f'avg_{key}'] = group.pop(key) / count
+        rows.append(group)
+    return sorted(rows, key=lambda row: row['avg_total_ms'], reverse=True)
+
+
+def _timed_render(render):
+    def wrapper(self, *args, **kwargs):
+        profile = _current.get()
+        # ویجت‌های فرم هم با همین متد رندر می‌شوند؛ فقط بیرونی‌ترین رندر زمان‌گیری می‌شود.
+        if profile is None or profile.rendering:
+            return render(self, *args, **kwargs)
+        profile.rendering = True
+        start = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            profile.template_ms += (time.perf_counter() - start) * 1000
+            profile.rendering = False
+    wrapper.profiled = True
+    return wrapper
+
+
+class ProfilingMiddleware:
+    """
+    Records SQL count/time, template time and total latency per request.
+    Raises MiddlewareNotUsed unless ``PROFILING_ENABLED`` is set, so the
+    entry in MIDDLEWARE costs nothing in normal operation.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = settings.PROFILING_REPEAT_THRESHOLD
+        self.excluded = tuple(settings.PROFILING_EXCLUDE)
+        # include ها داخل زمان قالب اصلی حساب می‌شوند.
+        if not getattr(DjangoTemplate.render, 'profiled', False):
+            DjangoTemplate.render = _timed_render(DjangoTemplate.render)
+
+    def __call__(self, request):
+        if request.path.startswith(self.excluded):
+            return self.get_response(request)
+
+        profile = RequestProfile(method=request.method, path=request.path, started_at=time.time())
+        token = _current.set(profile)
+
+        def execute(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                profile.record_query(sql, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(execute))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        profile.total_ms = (time.perf_counter() - start) * 1000
+
+        match = request.resolver_match
+        profile.url_name = match.view_name if match else request.path
+        profile.status = response.status_code
+        self.finish(profile)
+        return response
+
+    def finish(self, profile):
+        profile.repeated = [
+            (shape, count) for shape, count in profile.shapes.most_common() if count >= self.threshold
+        ]
+        # شکل کوئری‌ها فقط برای تشخیص تکرار لازم است؛ در بافر نگه داشته نمی‌شود.
+        profile.shapes = Counter()
+        for shape, count in profile.repeated:
+            logger.warning("Possible N+1 in %s: %d x %s", profile.url_name, count, shape)
+        with _buffer_lock:
+            _buffer.append(profile)
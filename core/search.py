@@ -0,0 +1,78 @@
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import Case, FloatField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Greatest, Upper
+
+from .models import Car, Owner, RepairJob
+
+# Shorter terms have no trigrams to look up, so they would scan the whole index.
+MIN_TERM_LENGTH = 3
+MAX_RESULTS = 20
+
+CAR_FIELDS = ('plate_number', 'claim_number', 'vin_number')
+OWNER_FIELDS = ('name', 'phone_number')
+
+
+def _matching(queryset, fields, term, fuzzy=False):
+    """
+    Filters ``queryset`` to rows where any of ``fields`` contains ``term``, or
+    with ``fuzzy`` is trigram-similar to it, and ranks them by their best
+    field: substring matches rank an exact value over a prefix over any other
+    hit, fuzzy matches by trigram similarity.
+
+    Every condition is written against ``UPPER(field)`` so it matches the
+    expression of the field's trigram GIN index and Postgres can combine the
+    indexes with a BitmapOr instead of scanning the table.
+    """
+    aliases = {f'{field}_upper': Upper(field) for field in fields}
+    lookup = 'trigram_similar' if fuzzy else 'contains'
+    condition = Q()
+    for alias in aliases:
+        condition |= Q(**{f'{alias}__{lookup}': term})
+    if fuzzy:
+        ranks = [TrigramSimilarity(alias, term) for alias in aliases]
+    else:
+        ranks = [
+            Case(
+                When(**{alias: term}, then=Value(1.0)),
+                When(**{f'{alias}__startswith': term}, then=Value(0.75)),
+                default=Value(0.5),
+                output_field=FloatField(),
+            )
+            for alias in aliases
+        ]
+    return queryset.alias(**aliases).filter(condition).annotate(
+        rank=Greatest(*ranks) if len(ranks) > 1 else ranks[0]
+    )
+
+
+def _search(cars, term, limit, fuzzy):
+    # Cars and owners are searched separately: an OR across the join would
+    # stop either table from using its indexes.
+    by_car = _matching(cars, CAR_FIELDS, term, fuzzy).order_by('-rank')[:limit]
+    owners = _matching(Owner.objects.all(), OWNER_FIELDS, term, fuzzy).order_by('-rank')[:limit]
+    owner_rank = {owner.id: owner.rank for owner in owners}
+    by_owner = cars.filter(owner_id__in=owner_rank)[:limit] if owner_rank else []
+
+    matches = {car.id: car for car in by_car}
+    for car in by_owner:
+        car.rank = max(owner_rank[car.owner_id], getattr(matches.get(car.id), 'rank', 0))
+        matches[car.id] = car
+    return sorted(matches.values(), key=lambda car: car.rank, reverse=True)[:limit]
+
+
+def find_cars(term, limit=MAX_RESULTS):
+    """
+    Finds cars by plate, claim or VIN number, or by their owner's name or
+    phone, best matches first. Returns at most ``limit`` cars, each with a
+    ``rank`` and the id of its latest job as ``latest_job_id``.
+
+    Substring matches come first; only when there are none does it fall back
+    to trigram similarity, which tolerates typos but matches far more rows.
+    """
+    term = (term or '').strip().upper()
+    if len(term) < MIN_TERM_LENGTH:
+        return []
+
+    latest_job = RepairJob.objects.filter(car=OuterRef('pk')).order_by('-id').values('id')[:1]
+    cars = Car.objects.select_related('owner').annotate(latest_job_id=Subquery(latest_job))
+    return _search(cars, term, limit, fuzzy=False) or _search(cars, term, limit, fuzzy=True)
@@ -0,0 +1,54 @@
+"""
+ذخیره‌سازی فایل‌ها بر اساس هش محتوا، تا یک عکس تکراری فقط یک بار روی دیسک بنشیند.
+
+Files land at ``<upload_to>/<aa>/<sha256><ext>``. Saving content that is
+already stored returns the existing name without writing, so a row is just a
+reference to a shared blob; ``core.media.release`` deletes a blob only once
+no row references it any more.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible(path='core.storage.ContentAddressedStorage')
+class ContentAddressedStorage(FileSystemStorage):
+
+    def get_available_name(self, name, max_length=None):
+        # نام نهایی را محتوا تعیین می‌کند؛ پسوند تصادفی لازم نیست.
+        return name
+
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        name = posixpath.join(posixpath.dirname(name), digest[:2], digest + extension)
+        if self.exists(name):
+            return name
+
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        # در فایل موقت نوشته و سپس جابجا می‌شود تا دو آپلود همزمان از یک
+        # محتوا، هیچ‌وقت فایل نیمه‌نوشته به هم نشان ندهند.
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                for chunk in content.chunks():
+                    tmp.write(chunk)
+            os.chmod(tmp_path, self.file_permissions_mode or 0o644)
+            os.replace(tmp_path, full_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return name
+
+
+media_storage = ContentAddressedStorage()
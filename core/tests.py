@@ -1,3 +1,668 @@
-from django.test import TestCase
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse, QueryDict
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from accounting.models import Income
+from . import fragments, images, media, pagination, pdfs, profiling
+from .models import Car, ItemName, Owner, Part, PurgedMedia, QuotationItem, RepairJob
+from .storage import media_storage
+
+
+class RepairJobIncomeSyncTests(TestCase):
+    """Income follows the deal amount, and only saves that change it pay for the sync."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='clerk')
+        self.car = Car.objects.create(plate_number='A-1', year=2020, registered_by=self.user)
+        self.job = RepairJob.objects.create(car=self.car)
+
+    def test_save_without_deal_change_is_one_update(self):
+        job = RepairJob.objects.get(id=self.job.id)
+        job.status = RepairJob.Stage.WORKING
+        with self.assertNumQueries(1):
+            job.save()
+
+    def test_deal_change_creates_updates_and_deletes_income(self):
+        job = RepairJob.objects.get(id=self.job.id)
+        job.deal = Decimal('500')
+        job.save()
+        income = Income.objects.get(repair_job=job)
+        self.assertEqual(income.amount, Decimal('500'))
+        self.assertEqual(income.recorded_by, self.user)
+
+        job = RepairJob.objects.get(id=self.job.id)
+        job.deal = Decimal('750')
+        job.save()
+        self.assertEqual(Income.objects.get(repair_job=job).amount, Decimal('750'))
+
+        job.status = RepairJob.Stage.WORKING
+        with self.assertNumQueries(1):
+            job.save()
+
+        job.deal = None
+        job.save()
+        self.assertFalse(Income.objects.filter(repair_job=job).exists())
+
+    def test_sync_for_jobs_is_constant_in_queries(self):
+        jobs = []
+        for i in range(10):
+            car = Car.objects.create(plate_number=f'B-{i}', year=2020, registered_by=self.user)
+            jobs.append(RepairJob(car=car, deal=Decimal(100 + i)))
+        RepairJob.objects.bulk_create(jobs)
+        jobs = list(RepairJob.objects.filter(id__in=[job.id for job in jobs]))
+
+        # cars, existing incomes, insert
+        with self.assertNumQueries(3):
+            Income.objects.sync_for_jobs(jobs)
+        self.assertEqual(Income.objects.filter(repair_job__in=jobs).count(), 10)
+
+
+class CarArchiveStateTests(TestCase):
+    """Car.is_archived follows its jobs and only costs queries when archival changes."""
+
+    def setUp(self):
+        self.car = Car.objects.create(plate_number='Z-1', year=2020)
+        self.job = RepairJob.objects.create(car=self.car)
+
+    def assertArchived(self, expected):
+        self.assertEqual(Car.objects.get(id=self.car.id).is_archived, expected)
+
+    def test_archiving_the_last_open_job_archives_the_car(self):
+        second = RepairJob.objects.create(car=self.car)
+        self.job.status = RepairJob.Stage.ARCHIVED
+        self.job.save()
+        self.assertArchived(False)
+
+        second.status = RepairJob.Stage.ARCHIVED
+        second.save()
+        self.assertArchived(True)
+        self.assertEqual(list(Car.objects.archived()), [self.car])
+
+        RepairJob.objects.create(car=self.car)
+        self.assertArchived(False)
+
+    def test_deleting_the_open_job_archives_the_car(self):
+        RepairJob.objects.create(car=self.car, status=RepairJob.Stage.ARCHIVED)
+        self.job.delete()
+        self.assertArchived(True)
+
+    def test_status_change_within_the_workflow_is_one_update(self):
+        job = RepairJob.objects.get(id=self.job.id)
+        job.status = RepairJob.Stage.QUOTATION
+        with self.assertNumQueries(1):
+            job.save()
+
+
+class RepairDashboardBulkUpdateTests(TestCase):
+    """A dashboard submit costs a handful of queries however many jobs it shows."""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='manager')
+        self.client.force_login(self.user)
+        self.jobs = []
+        for i in range(30):
+            car = Car.objects.create(plate_number=f'D-{i}', year=2020, registered_by=self.user)
+            self.jobs.append(RepairJob.objects.create(car=car))
+
+    def submit(self, data):
+        data.setdefault('job_ids', [str(job.id) for job in self.jobs])
+        return self.client.post(reverse('core:repair_dashboard'), data)
+
+    def test_unchanged_submit_writes_nothing(self):
+        # session, user, jobs
+        with self.assertNumQueries(3):
+            self.submit({})
+
+    def test_changes_are_written_in_bulk(self):
+        data = {f'lpo_{job.id}': 'on' for job in self.jobs}
+        data.update({f'deal_{job.id}': '250' for job in self.jobs[:10]})
+        # session, user, jobs, savepoint, bulk update, existing incomes, income insert, release
+        with self.assertNumQueries(8):
+            self.submit(data)
+
+        self.assertEqual(RepairJob.objects.filter(lpo_confirmed=True).count(), 30)
+        self.assertEqual(Income.objects.filter(amount=250).count(), 10)
+
+    def test_jobs_missing_from_the_form_are_left_alone(self):
+        late = self.jobs[-1]
+        RepairJob.objects.filter(id=late.id).update(lpo_confirmed=True)
+        self.submit({'job_ids': [str(job.id) for job in self.jobs[:-1]]})
+        late.refresh_from_db()
+        self.assertTrue(late.lpo_confirmed)
+
+
+class TempDirSettingsMixin:
+    """Points directory settings at fresh temporary directories for one test."""
+
+    def temp_dir_setting(self, name):
+        """Sets ``name`` to a new temporary directory, removed after the test, and returns its path."""
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        settings_override = override_settings(**{name: path})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        return path
+
+
+class PurgeArchivedMediaTests(TempDirSettingsMixin, TestCase):
+    """The sweeper removes media of archived jobs once, and never on the save path."""
+
+    def setUp(self):
+        self.media_root = self.temp_dir_setting('MEDIA_ROOT')
+
+        self.user = User.objects.create_user(username='clerk')
+        self.car = Car.objects.create(
+            plate_number='M-1', year=2020, registered_by=self.user,
+            image=SimpleUploadedFile('car.jpg', b'car-bytes'),
+        )
+        self.job = RepairJob.objects.create(car=self.car)
+        self.part = Part.objects.create(
+            repair_job=self.job, name='Bumper', picture=SimpleUploadedFile('bumper.jpg', b'part'),
+        )
+
+    def archive(self, job):
+        job.status = RepairJob.Stage.ARCHIVED
+        job.save()
+
+    def test_archiving_leaves_files_for_the_sweeper(self):
+        self.archive(self.job)
+        self.car.refresh_from_db()
+        self.assertTrue(self.car.image.storage.exists(self.car.image.name))
+
+    def test_sweep_deletes_records_and_is_idempotent(self):
+        car_image, part_picture = self.car.image.name, self.part.picture.name
+        self.archive(self.job)
+
+        result = media.purge_archived_media()
+        self.assertEqual((result.jobs, result.files, result.bytes), (1, 2, 13))
+
+        storage = self.car.image.storage
+        self.assertFalse(storage.exists(car_image))
+        self.assertFalse(storage.exists(part_picture))
+        self.car.refresh_from_db()
+        self.part.refresh_from_db()
+        self.assertFalse(self.car.image)
+        self.assertFalse(self.part.picture)
+        self.assertEqual(
+            set(PurgedMedia.objects.values_list('name', flat=True)), {car_image, part_picture},
+        )
+        self.job.refresh_from_db()
+        self.assertIsNotNone(self.job.media_purged_at)
+
+        # pending jobs only
+        with self.assertNumQueries(1):
+            result = media.purge_archived_media()
+        self.assertEqual(result.jobs, 0)
+
+    def test_car_image_kept_while_car_has_an_open_job(self):
+        RepairJob.objects.create(car=self.car)
+        self.archive(self.job)
+
+        result = media.purge_archived_media()
+        self.assertEqual(result.files, 1)
+        self.car.refresh_from_db()
+        self.assertTrue(self.car.image.storage.exists(self.car.image.name))
+
+    def test_shared_blob_survives_until_its_last_reference_goes(self):
+        other_car = Car.objects.create(plate_number='M-2', year=2020, registered_by=self.user)
+        other_job = RepairJob.objects.create(car=other_car)
+        twin = Part.objects.create(
+            repair_job=other_job, name='Bumper', picture=SimpleUploadedFile('again.jpg', b'part'),
+        )
+        self.assertEqual(twin.picture.name, self.part.picture.name)
+        storage = twin.picture.storage
+
+        self.archive(self.job)
+        media.purge_archived_media()
+        self.assertTrue(storage.exists(twin.picture.name))
+
+        self.archive(other_job)
+        result = media.purge_archived_media()
+        self.assertEqual(result.names, [twin.picture.name])
+        self.assertFalse(storage.exists(twin.picture.name))
+
+    def test_dry_run_changes_nothing(self):
+        self.archive(self.job)
+        call_command('purge_archived_media', '--dry-run', stdout=StringIO())
+
+        self.car.refresh_from_db()
+        self.assertTrue(self.car.image.storage.exists(self.car.image.name))
+        self.assertFalse(PurgedMedia.objects.exists())
+        self.assertEqual(media.pending_jobs().count(), 1)
+
+
+def jpeg_upload(name='photo.jpg', size=(3000, 2000)):
+    """A phone-sized JPEG carrying EXIF (orientation and a GPS-like tag)."""
+    exif = Image.Exif()
+    exif[0x0112] = 1
+    exif[0x010F] = 'PhoneMaker'
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, 'JPEG', quality=95, exif=exif.tobytes())
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class ContentAddressedStorageTests(TempDirSettingsMixin, TestCase):
+    """Identical uploads share one file named after their content."""
+
+    def setUp(self):
+        self.media_root = self.temp_dir_setting('MEDIA_ROOT')
+
+    def test_duplicates_are_stored_once(self):
+        first = media_storage.save('parts/a.jpg', ContentFile(b'same'))
+        second = media_storage.save('parts/b.JPG', ContentFile(b'same'))
+        third = media_storage.save('parts/c.jpg', ContentFile(b'other'))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, third)
+        digest = hashlib.sha256(b'same').hexdigest()
+        self.assertEqual(first, f'parts/{digest[:2]}/{digest}.jpg')
+        self.assertEqual(len(os.listdir(os.path.dirname(media_storage.path(first)))), 1)
+
+    def test_release_keeps_referenced_blobs(self):
+        car = Car.objects.create(plate_number='S-1', year=2020, image=SimpleUploadedFile('x.jpg', b'shared'))
+        loose = media_storage.save('parts/y.jpg', ContentFile(b'loose'))
+
+        self.assertEqual(media.release([car.image.name, loose]), [loose])
+        self.assertTrue(media_storage.exists(car.image.name))
+        self.assertFalse(media_storage.exists(loose))
+
+
+class ImagePipelineTests(TempDirSettingsMixin, TestCase):
+    """Uploads are recompressed without EXIF and get a WebP thumbnail."""
+
+    def setUp(self):
+        self.media_root = self.temp_dir_setting('MEDIA_ROOT')
+        self.user = User.objects.create_superuser(username='manager')
+
+    def test_upload_is_downscaled_and_thumbnailed(self):
+        car = Car.objects.create(plate_number='I-1', year=2020, image=jpeg_upload())
+
+        with Image.open(car.image.path) as original:
+            self.assertLessEqual(max(original.size), images.ORIGINAL_MAX_SIZE[0])
+            self.assertEqual(len(original.getexif()), 0)
+        with Image.open(car.thumbnail.path) as thumbnail:
+            self.assertEqual(thumbnail.format, 'WEBP')
+            self.assertLessEqual(max(thumbnail.size), images.THUMBNAIL_SIZE[0])
+        self.assertEqual(car.thumbnail_url, car.thumbnail.url)
+
+    def test_plain_saves_do_not_reprocess(self):
+        car = Car.objects.create(plate_number='I-2', year=2020, image=jpeg_upload())
+        name = car.image.name
+        car.model = 'Camry'
+        car.save()
+        self.assertEqual(car.image.name, name)
+
+    def test_parts_endpoint_serves_thumbnails(self):
+        car = Car.objects.create(plate_number='I-3', year=2020)
+        job = RepairJob.objects.create(car=car)
+        part = Part.objects.create(repair_job=job, name='Door', picture=jpeg_upload('door.jpg'))
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('accounting:ajax_get_parts'), {'car_id': car.id})
+        self.assertEqual(response.json()['parts'][0]['picture'], part.thumbnail.url)
+
+    def test_backfill_processes_stored_originals(self):
+        car = Car.objects.create(plate_number='I-4', year=2020)
+        raw = car.image.storage.save('car_pictures/raw.jpg', jpeg_upload())
+        Car.objects.filter(id=car.id).update(image=raw)
+
+        call_command('process_images', stdout=StringIO())
+
+        car.refresh_from_db()
+        self.assertTrue(car.thumbnail)
+        self.assertFalse(car.image.storage.exists(raw))
+        with Image.open(car.image.path) as original:
+            self.assertLessEqual(max(original.size), images.ORIGINAL_MAX_SIZE[0])
+
+
+@override_settings(PROFILING_ENABLED=True)
+class ProfilingMiddlewareTests(TestCase):
+    """Requests are recorded per URL name and repeated query shapes are flagged."""
+
+    def setUp(self):
+        profiling._buffer.clear()
+        self.staff = User.objects.create_user(username='ops', is_staff=True)
+        self.client.force_login(self.staff)
+
+    def test_request_is_recorded_under_its_url_name(self):
+        self.client.get(reverse('core:car_list'))
+
+        [profile] = profiling.recent()
+        self.assertEqual(profile.url_name, 'core:car_list')
+        self.assertEqual(profile.status, 200)
+        self.assertGreater(profile.sql_count, 0)
+        self.assertGreater(profile.template_ms, 0)
+        self.assertGreaterEqual(profile.total_ms, profile.template_ms)
+
+    def test_repeated_query_shapes_are_flagged(self):
+        cars = [Car.objects.create(plate_number=f'P-{i}', year=2020) for i in range(6)]
+
+        def n_plus_one(request):
+            for car in cars:
+                list(Car.objects.filter(id=car.id))
+            list(Car.objects.filter(id__in=[1, 2]))
+            list(Car.objects.filter(id__in=[1, 2, 3]))
+            return HttpResponse()
+
+        with self.assertLogs('core.profiling', 'WARNING'):
+            profiling.ProfilingMiddleware(n_plus_one)(RequestFactory().get('/cars/'))
+
+        [profile] = profiling.recent()
+        self.assertEqual(profile.sql_count, 8)
+        self.assertEqual([count for _, count in profile.repeated], [6])
+
+    def test_endpoint_is_staff_only(self):
+        self.client.get(reverse('core:car_list'))
+        response = self.client.get(reverse('core:profiling'))
+        self.assertContains(response, 'core:car_list')
+
+        self.client.force_login(User.objects.create_user(username='clerk'))
+        response = self.client.get(reverse('core:profiling'))
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_disabled_by_default(self):
+        self.client.get(reverse('core:car_list'))
+        self.assertEqual(profiling.recent(), [])
+
+
+class ItemNameAutocompleteTests(TestCase):
+    """The quotation form no longer lists the item catalogue; items are found by prefix."""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='clerk')
+        self.client.force_login(user)
+        car = Car.objects.create(plate_number='A-1', year=2020, registered_by=user)
+        self.job = RepairJob.objects.create(car=car, status=RepairJob.Stage.QUOTATION)
+        ItemName.objects.bulk_create(
+            [ItemName(name=f'Bumper {i}') for i in range(30)] + [ItemName(name='Rear Bumper')]
+        )
+
+    def test_job_detail_ships_no_item_options(self):
+        response = self.client.get(reverse('core:job_detail', args=[self.job.id]))
+        self.assertContains(response, reverse('core:item_name_autocomplete'))
+        self.assertNotContains(response, 'Bumper 1')
+
+    def test_prefix_match_is_capped(self):
+        url = reverse('core:item_name_autocomplete')
+        data = self.client.get(url, {'q': 'bump'}).json()
+        self.assertEqual(len(data['results']), 20)
+        self.assertTrue(data['pagination']['more'])
+        self.assertNotIn('Rear Bumper', [r['text'] for r in data['results']])
+        self.assertEqual([r['text'] for r in self.client.get(url, {'q': 'rear'}).json()['results']], ['Rear Bumper'])
+
+
+class JobDetailFragmentCacheTests(TestCase):
+    """The job page body is cached per job version; any change to what it shows bumps the version."""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='clerk')
+        self.client.force_login(user)
+        self.car = Car.objects.create(plate_number='F-1', year=2020, registered_by=user)
+        self.job = RepairJob.objects.create(car=self.car, status=RepairJob.Stage.QUOTATION)
+        self.url = reverse('core:job_detail', args=[self.job.id])
+
+    def test_unchanged_job_is_served_from_the_cache(self):
+        self.client.get(self.url)
+        # session, user, job
+        with self.assertNumQueries(3):
+            self.client.get(self.url)
+
+    def test_related_writes_change_the_page(self):
+        self.client.get(self.url)
+        Part.objects.create(repair_job=self.job, name='Left mirror')
+        self.assertContains(self.client.get(self.url), 'Left mirror')
+
+        item = QuotationItem.objects.create(repair_job=self.job, custom_name='Paint', quantity=1, price=10)
+        self.assertContains(self.client.get(self.url), 'Paint')
+        item.delete()
+        self.assertNotContains(self.client.get(self.url), 'Paint')
+
+        self.car.model = 'Patrol'
+        self.car.save()
+        self.assertContains(self.client.get(self.url), 'Patrol')
+
+    def test_post_renders_the_new_version(self):
+        self.client.get(self.url)
+        response = self.client.post(self.url, {'add_part': '', 'name': 'Grille'})
+        self.assertContains(response, 'Grille')
+
+    def test_csrf_token_is_not_cached(self):
+        self.client.get(self.url)
+        for username in ('first', 'second'):
+            client = self.client_class(enforce_csrf_checks=True)
+            client.force_login(User.objects.create_user(username=username))
+            page = client.get(self.url).content.decode()
+            self.assertNotIn(fragments.CSRF_PLACEHOLDER, page)
+            token = page.split('name="csrfmiddlewaretoken" value="')[1].split('"')[0]
+            response = client.post(self.url, {'add_part': '', 'name': username, 'csrfmiddlewaretoken': token})
+            self.assertEqual(response.status_code, 200)
+
+
+class PdfCachePruneTests(TempDirSettingsMixin, TestCase):
+    """Superseded PDFs outlive their replacement until they go unused."""
+
+    def setUp(self):
+        self.cache_dir = self.temp_dir_setting('PDF_CACHE_DIR')
+        os.makedirs(os.path.join(self.cache_dir, 'quotation'))
+
+    def cached(self, name, hours_ago):
+        path = os.path.join(self.cache_dir, 'quotation', name)
+        with open(path, 'wb') as f:
+            f.write(b'%PDF')
+        moment = time.time() - hours_ago * 3600
+        os.utime(path, (moment, moment))
+        return path
+
+    def test_only_unused_superseded_versions_are_deleted(self):
+        old = self.cached('7_old.pdf', 3)
+        recent = self.cached('7_recent.pdf', 0.5)
+        served = self.cached('7_served.pdf', 3)
+        only = self.cached('8_only.pdf', 5)
+        artifact = pdfs.PdfArtifact('quotation', 7, '<p>quote</p>', 'q.pdf')
+        os.rename(served, artifact.path)
+
+        # Handing the file out again keeps it, though a newer version exists.
+        self.assertEqual(artifact.wait(), artifact.path)
+        self.assertEqual(pdfs.prune_cache(), 1)
+        self.assertFalse(os.path.exists(old))
+        for path in (recent, artifact.path, only):
+            self.assertTrue(os.path.exists(path))
+
+
+class QuotationContextTests(TestCase):
+    """A job's quotation is built in one query whether or not its items were prefetched."""
+
+    def test_item_names_are_joined(self):
+        car = Car.objects.create(plate_number='Q-1', year=2020)
+        job = RepairJob.objects.create(car=car)
+        for i in range(5):
+            QuotationItem.objects.create(
+                repair_job=job, item_name=ItemName.objects.create(name=f'Door {i}'), quantity=1, price=10,
+            )
+
+        job = RepairJob.objects.get(id=job.id)
+        with self.assertNumQueries(1):
+            context = pdfs.quotation_context(job)
+            names = [item.display_name for item in context['items']]
+        self.assertEqual(len(names), 5)
+
+        job = RepairJob.objects.prefetch_related(pdfs.QUOTATION_PREFETCH).get(id=job.id)
+        with self.assertNumQueries(0):
+            pdfs.quotation_context(job)
+
+
+class QuotationBatchTests(TestCase):
+    """Batch exports pick jobs by status, registration date and claim, within a per-request limit."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user(username='clerk'))
+        self.day = timezone.make_aware(datetime(2025, 5, 10, 12))
+        self.jobs = {}
+        for name, days, status in [('early', -3, 'working'), ('on_day', 0, 'exit'), ('late', 1, 'working')]:
+            car = Car.objects.create(
+                plate_number=name, year=2020, claim_number=f'CLM-{name}', registered_at=self.day + timedelta(days=days),
+            )
+            self.jobs[name] = RepairJob.objects.create(car=car, status=status)
+
+    def picked(self, **filters):
+        return {job.car.plate_number for job in pdfs.quotation_batch_jobs(**filters)}
+
+    def test_filters(self):
+        self.assertEqual(self.picked(), {'early', 'on_day', 'late'})
+        self.assertEqual(self.picked(status='working'), {'early', 'late'})
+        # Both ends of the date range are whole days.
+        self.assertEqual(self.picked(start_date=self.day.date(), end_date=self.day.date()), {'on_day'})
+        self.assertEqual(self.picked(start_date=self.day.date()), {'on_day', 'late'})
+        self.assertEqual(self.picked(end_date=self.day.date()), {'early', 'on_day'})
+        self.assertEqual(self.picked(claim_numbers=['CLM-early', 'CLM-late']), {'early', 'late'})
+        self.assertEqual(self.picked(status='exit', claim_numbers=['CLM-early']), set())
+
+    def export(self, **params):
+        return self.client.get(reverse('core:quotation_batch'), {'output': 'zip', **params})
+
+    def test_nothing_is_rendered_without_matches_or_over_the_limit(self):
+        with mock.patch.object(pdfs, 'render_batch') as render_batch:
+            self.assertContains(self.export(status='archived'), "No jobs match these filters.")
+            with mock.patch.object(pdfs, 'BATCH_LIMIT', 2):
+                self.assertContains(self.export(start_date='2025-05-01'), "More than 2 jobs match")
+        render_batch.assert_not_called()
+
+    def test_batch_is_rendered_within_a_time_limit(self):
+        with mock.patch.object(pdfs, 'render_batch', return_value=[]) as render_batch:
+            response = self.export(status='working')
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        jobs = render_batch.call_args.args[0]
+        self.assertEqual({job.id for job in jobs}, {self.jobs['early'].id, self.jobs['late'].id})
+        self.assertEqual(render_batch.call_args.kwargs, {'timeout': settings.PDF_BATCH_WAIT})
+
+        with mock.patch.object(pdfs, 'render_batch', side_effect=TimeoutError):
+            self.assertContains(self.export(status='working'), "export_quotations")
+
+
+class CarSearchTests(TestCase):
+    """Plates, claims and owners are found by substring first, by similarity as a fallback."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user(username='clerk'))
+        owner = Owner.objects.create(name='Rahim Karimi', phone_number='0501234567')
+        self.car = Car.objects.create(plate_number='ABC-123', claim_number='CLM-77001', year=2020, owner=owner)
+        self.job = RepairJob.objects.create(car=self.car)
+        Car.objects.create(plate_number='XABC-9', claim_number='CLM-5', year=2020)
+
+    def search(self, term):
+        return self.client.get(reverse('core:car_search'), {'q': term}).json()['results']
+
+    def test_exact_and_prefix_matches(self):
+        [exact, *_] = self.search('abc-123')
+        self.assertEqual((exact['plate_number'], exact['rank']), ('ABC-123', 1.0))
+        self.assertEqual(exact['url'], reverse('core:job_detail', args=[self.job.id]))
+
+        self.assertEqual([car['plate_number'] for car in self.search('abc')], ['ABC-123', 'XABC-9'])
+        self.assertEqual([car['plate_number'] for car in self.search('clm-770')], ['ABC-123'])
+        self.assertEqual([car['plate_number'] for car in self.search('karimi')], ['ABC-123'])
+        self.assertEqual(self.search('ab'), [])
+
+    @skipUnless(connection.vendor == 'postgresql', "trigram similarity is PostgreSQL-only")
+    def test_typos_fall_back_to_trigram_similarity(self):
+        [car] = self.search('ABC-124')
+        self.assertEqual(car['plate_number'], 'ABC-123')
+        self.assertLess(car['rank'], 1)
+
+
+class PaginationTests(TestCase):
+    """Keyset pages seek past the last row shown, breaking timestamp ties by id."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        moment = timezone.make_aware(datetime(2025, 1, 1, 9))
+        # Three jobs share a timestamp, so pages must split on the id.
+        for i, hours in enumerate([0, 0, 0, 1, 2, -1, 3]):
+            car = Car.objects.create(plate_number=f'P-{i}', year=2020, registered_at=moment + timedelta(hours=hours))
+            RepairJob.objects.create(car=car)
+        self.jobs = RepairJob.objects.select_related('car')
+
+    def walk(self, ordering):
+        seen, query = [], ''
+        while True:
+            page = pagination.keyset_page(self.factory.get('/', QueryDict(query)), self.jobs, ordering, per_page=2)
+            seen += [job.id for job in page]
+            if not page.has_next():
+                return seen
+            query = page.next_query
+
+    def test_pages_neither_repeat_nor_skip_rows(self):
+        for ordering in [('car__registered_at', 'id'), ('-car__registered_at', '-id')]:
+            expected = list(self.jobs.order_by(*ordering).values_list('id', flat=True))
+            self.assertEqual(self.walk(ordering), expected, ordering)
+
+    def test_cursor_parsing(self):
+        parsed = pagination._parse_cursor('2025-01-01T09:00:00+00:00|7')
+        self.assertEqual(parsed, (datetime.fromisoformat('2025-01-01T09:00:00+00:00'), 7))
+        for cursor in [None, 'garbage', '2025-01-01T09:00:00|x', '2025-13-45T00:00:00|3']:
+            self.assertIsNone(pagination._parse_cursor(cursor), cursor)
+        # A well-formed pk without a readable timestamp is ignored as well.
+        self.assertEqual(pagination._parse_cursor('soon|3'), (None, 3))
+
+    def test_invalid_cursor_shows_the_first_page(self):
+        ordering = ('car__registered_at', 'id')
+        first = [job.id for job in pagination.keyset_page(self.factory.get('/'), self.jobs, ordering, per_page=2)]
+        for cursor in ['garbage', 'soon|3', '2025-13-45T00:00:00|3']:
+            request = self.factory.get('/', {'after': cursor})
+            page = pagination.keyset_page(request, self.jobs, ordering, per_page=2)
+            self.assertEqual([job.id for job in page], first, cursor)
+
+    def test_offset_page_links(self):
+        request = self.factory.get('/', {'page': '2', 'sort': 'status'})
+        page = pagination.offset_page(request, self.jobs.order_by('id'), per_page=3)
+        self.assertEqual(len(page), 3)
+        self.assertEqual(QueryDict(page.previous_query), QueryDict('page=1&sort=status'))
+        self.assertEqual(QueryDict(page.next_query), QueryDict('page=3&sort=status'))
+        self.assertEqual(len(pagination.offset_page(self.factory.get('/', {'page': 'x'}), self.jobs.order_by('id'), 3)), 3)
+
+
+class SeedAndBenchmarkTests(TestCase):
+    """The seed command fills every table the benchmarks read; the harness writes JSON."""
+
+    def test_seed_then_benchmark(self):
+        out = StringIO()
+        call_command('seed_garage_data', cars=60, employees=2, days=90, stdout=out)
+        self.assertTrue(Part.objects.exists())
+        self.assertTrue(QuotationItem.objects.exists())
+        archived = RepairJob.objects.filter(status=RepairJob.Stage.ARCHIVED).first()
+        self.assertIsNotNone(archived.exited_at)
+        self.assertTrue(archived.car.is_archived)
+
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        call_command(
+            'benchmark_views', '--only', 'car_list', 'job_detail', '--runs', '1',
+            '--label', 'ci', '--output-dir', output_dir, stdout=out,
+        )
+        with open(os.path.join(output_dir, 'ci.json')) as f:
+            report = json.load(f)
+        self.assertEqual(set(report['results']), {'car_list', 'job_detail'})
+        self.assertEqual(report['results']['job_detail']['status'], 200)
+        self.assertGreater(report['meta']['rows']['RepairJob'], 0)
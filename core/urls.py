@@ -2,10 +2,13 @@ from django.urls import path
 from .views import (
     index, 
     car_management_view, 
+    car_search_view,
+    ItemNameAutocomplete,
     job_detail_view, 
     edit_car_view, 
     update_job_status_view, 
     generate_quotation_pdf,
+    quotation_batch_view,
     delete_part_view,
     mark_part_as_bought_view,
     delete_quotation_item_view,
@@ -13,6 +16,7 @@ from .views import (
     pause_timer_view,
     generate_car_owner_pdf,
     repair_dashboard,
+    profiling_view,
 )
 
 app_name = "core"
@@ -21,6 +25,8 @@ urlpatterns = [
     # General Pages
     path("", index, name="home"),
     path('cars/', car_management_view, name='car_list'),
+    path('cars/search/', car_search_view, name='car_search'),
+    path('items/autocomplete/', ItemNameAutocomplete.as_view(), name='item_name_autocomplete'),
     
     # Job and Car Specific Views
     path('job/<int:job_id>/', job_detail_view, name='job_detail'),
@@ -29,6 +35,7 @@ urlpatterns = [
     # Workflow and Action URLs
     path('job/<int:job_id>/update_status/<str:next_status>/', update_job_status_view, name='update_job_status'),
     path('job/<int:job_id>/quotation/pdf/', generate_quotation_pdf, name='quotation_pdf'),
+    path('quotations/batch/', quotation_batch_view, name='quotation_batch'),
     path('part/<int:part_id>/mark_as_bought/', mark_part_as_bought_view, name='mark_part_as_bought'),
 
     # --- Corrected URLs for Deleting Items ---
@@ -39,4 +46,5 @@ urlpatterns = [
     path('job/<int:job_id>/resume/', resume_timer_view, name='resume_timer'),
     path('car/<int:car_id>/pdf/', generate_car_owner_pdf, name='car_owner_pdf'),
     path('repair-dashboard/', repair_dashboard, name='repair_dashboard'),
+    path('profiling/', profiling_view, name='profiling'),
 ]
\ No newline at end of file
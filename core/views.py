@@ -1,22 +1,26 @@
 from django.shortcuts import render, redirect, get_object_or_404, HttpResponse
+from django.db import transaction
+from django.db.models import F
+from django.http import FileResponse, JsonResponse
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required 
 from django.contrib import messages
 from django.utils import timezone 
-from django.template.loader import get_template
-from xhtml2pdf import pisa
 from datetime import timedelta
+import tempfile
 from decimal import Decimal
 from django.contrib.auth.decorators import permission_required
-from django.template.loader import render_to_string
-import io
-import os
+from django.contrib.admin.views.decorators import staff_member_required
 from django.conf import settings
 from markdownx.models import MarkdownxField
-from pathlib import Path
-from weasyprint import HTML
+from accounting.choices import CachedAutocompleteView
 from accounting.models import Income
+from .pagination import keyset_page, offset_page
+from .search import find_cars
+from . import pdfs, profiling
+from .fragments import render_with_csrf_placeholder
 # Import all the final, correct models and forms
-from .models import Car, RepairJob, Part, QuotationItem
+from .models import Car, ItemName, RepairJob, Part, QuotationItem
 from .forms import (
     CarRegistrationForm, 
     JobFilterForm, 
@@ -26,7 +30,8 @@ from .forms import (
     SignConfirmationForm,
     LpoConfirmationForm,
     OwnerForm,
-    BuyPartForm
+    BuyPartForm,
+    QuotationBatchForm,
 )
 
 # --- Main/Home View ---
@@ -77,6 +82,11 @@ def car_management_view(request):
         car_form = CarRegistrationForm()
         owner_form = OwnerForm()
 
+    if sort_field == '-car__registered_at':
+        jobs = keyset_page(request, jobs, ('-car__registered_at', '-id'))
+    else:
+        jobs = offset_page(request, jobs)
+
     context = {
         'car_form': car_form,
         'owner_form': owner_form,
@@ -85,12 +95,45 @@ def car_management_view(request):
     }
     return render(request, 'core/cars.html', context)
 
+
+@login_required
+def car_search_view(request):
+    """Single-box search over every car, archived or not, as ranked JSON."""
+    results = [
+        {
+            'id': car.id,
+            'plate_number': car.plate_number,
+            'claim_number': car.claim_number,
+            'vin_number': car.vin_number,
+            'brand': car.get_brand_display(),
+            'model': car.model,
+            'owner': car.owner.name if car.owner else None,
+            'owner_phone': car.owner.phone_number if car.owner else None,
+            'rank': round(car.rank, 3),
+            'url': reverse('core:job_detail', args=[car.latest_job_id]) if car.latest_job_id else None,
+        }
+        for car in find_cars(request.GET.get('q'))
+    ]
+    return JsonResponse({'results': results})
+
+
+class ItemNameAutocomplete(CachedAutocompleteView):
+    """آیتم‌های کاتالوگ پیش‌فاکتور، با پیشوند نام."""
+    cache_name = 'item_names'
+
+    def get_queryset(self):
+        items = ItemName.objects.order_by('name')
+        if self.q:
+            items = items.filter(name__istartswith=self.q.strip())
+        return items
+
 # --- Job Detail & Workflow View ---
 @login_required
 def job_detail_view(request, job_id):
-    job = get_object_or_404(RepairJob, id=job_id)
+    job = get_object_or_404(RepairJob.objects.select_related('car__registered_by', 'car__owner'), id=job_id)
+    # Lazy: evaluated only when the cached fragment for this version is missing.
     parts = Part.objects.filter(repair_job=job)
-    quotation_items = QuotationItem.objects.filter(repair_job=job) # Added query
+    quotation_items = QuotationItem.objects.filter(repair_job=job).select_related('item_name') # Added query
 
     if request.method == 'POST':
         # --- START: Added logic for QuotationItemForm ---
@@ -101,6 +144,8 @@ def job_detail_view(request, job_id):
                 item.repair_job = job
                 item.save()
                 messages.success(request, 'Quotation item added.')
+                # Have the new quotation PDF ready before anyone asks for it.
+                pdfs.quotation_pdf(job).submit()
         # --- END: Added logic ---
         elif 'add_part' in request.POST:
             form = PartItemForm(request.POST, request.FILES)
@@ -132,6 +177,8 @@ def job_detail_view(request, job_id):
                 lpo_job.save()
                 messages.success(request, 'LPO information saved and job archived.')
                 return redirect('core:job_detail', job_id=job.id)
+        # The saves above bumped the version in the database only.
+        job.refresh_from_db(fields=['detail_version'])
     # For GET requests, create instances of all forms
     context = {
         'job': job,
@@ -142,8 +189,9 @@ def job_detail_view(request, job_id):
         'deal_form': DealUpdateForm(instance=job),
         'sign_form': SignConfirmationForm(instance=job),
         'lpo_form': LpoConfirmationForm(instance=job),
+        'fragment_timeout': settings.JOB_DETAIL_CACHE_TIMEOUT,
     }
-    return render(request, 'core/job_detail.html', context)
+    return render_with_csrf_placeholder(request, 'core/job_detail.html', context)
 
 @login_required
 def pause_timer_view(request, job_id):
@@ -251,17 +299,7 @@ def edit_car_view(request, car_id):
             messages.success(request, 'Car and owner information updated successfully.')
 
             if 'generate_pdf' in request.POST:
-                html_string = render_to_string('core/car_owner_pdf_template.html', {
-                    'car': car_instance,
-                    'owner': owner_instance,
-                })
-                result = io.BytesIO()
-                pdf = pisa.CreatePDF(io.BytesIO(html_string.encode('utf-8')), dest=result)
-                if pdf.err:
-                    return HttpResponse('Error generating PDF', status=500)
-                response = HttpResponse(result.getvalue(), content_type='application/pdf')
-                response['Content-Disposition'] = f'attachment; filename=car_{car_instance.plate_number}_owner.pdf'
-                return response
+                return _pdf_response(request, pdfs.car_owner_pdf(car_instance))
 
             latest_job = car_instance.jobs.order_by('-registered_at').first()
             return redirect('core:job_detail', job_id=latest_job.id) if latest_job else redirect('core:car_list')
@@ -290,7 +328,8 @@ def delete_part_view(request, part_id):
 # --- START: New View for Deleting Quotation Items ---
 @login_required
 def delete_quotation_item_view(request, item_id):
-    item = get_object_or_404(QuotationItem, id=item_id)
+    # The job and car are rendered into the refreshed quotation PDF below.
+    item = get_object_or_404(QuotationItem.objects.select_related('item_name', 'repair_job__car__owner'), id=item_id)
     job_id = item.repair_job.id
 
     item_display_name = item.custom_name if item.custom_name else (item.item_name.name if item.item_name else 'Unknown Item')
@@ -298,6 +337,7 @@ def delete_quotation_item_view(request, item_id):
     if request.method == 'POST':
         item.delete()
         messages.success(request, f'Item "{item_display_name}" deleted from quotation.')
+        pdfs.quotation_pdf(item.repair_job).submit()
 
     return redirect('core:job_detail', job_id=job_id)
 
@@ -320,82 +360,121 @@ def mark_part_as_bought_view(request, part_id):
     return JsonResponse({'error': 'Invalid request'}, status=400)
 
 
+def _pdf_response(request, artifact):
+    """Serves a cached/rendered PDF, or a self-refreshing notice while it renders."""
+    path = artifact.wait(timeout=settings.PDF_RENDER_WAIT)
+    if path is None:
+        response = render(request, 'core/pdf_pending.html', {'filename': artifact.filename}, status=202)
+        response['Refresh'] = '3'
+        return response
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=artifact.filename, content_type='application/pdf')
+
+
 @login_required
 def generate_quotation_pdf(request, job_id):
-    job = get_object_or_404(RepairJob, id=job_id)
-    items = QuotationItem.objects.filter(repair_job=job)
-    
-    sub_total = sum(item.amount for item in items)
-    tax_rate = Decimal('0.05') 
-    tax_due = sub_total * tax_rate
-    total_final = sub_total + tax_due
-
-    context = {
-        'job': job,
-        'items': items,
-        'sub_total': sub_total,
-        'tax_rate': int(tax_rate * 100),
-        'tax_due': tax_due,
-        'total_final': total_final,
-    }
+    job = get_object_or_404(
+        RepairJob.objects.select_related('car__owner').prefetch_related(pdfs.QUOTATION_PREFETCH), id=job_id
+    )
+    return _pdf_response(request, pdfs.quotation_pdf(job))
 
-    html_string = render_to_string('reports/quotation_pdf_custom.html', context)
-    html = HTML(string=html_string, base_url=request.build_absolute_uri('/'))
-    pdf_file = html.write_pdf()
 
-    filename = f'quotation_{job.car.plate_number}.pdf'
-    response = HttpResponse(pdf_file, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    return response
+@login_required
+def quotation_batch_view(request):
+    """Exports the quotations of many jobs at once, as a ZIP or one merged PDF."""
+    form = QuotationBatchForm(request.GET or None)
+    if form.is_valid():
+        data = form.cleaned_data
+        jobs = list(pdfs.quotation_batch_jobs(
+            data['status'], data['start_date'], data['end_date'], data['claim_numbers']
+        )[:pdfs.BATCH_LIMIT + 1])
+        if not jobs:
+            messages.warning(request, "No jobs match these filters.")
+        elif len(jobs) > pdfs.BATCH_LIMIT:
+            messages.warning(
+                request,
+                f"More than {pdfs.BATCH_LIMIT} jobs match; narrow the filters, "
+                "or run the export_quotations management command for large exports.",
+            )
+        else:
+            try:
+                batch = pdfs.render_batch(jobs, timeout=settings.PDF_BATCH_WAIT)
+            except TimeoutError:
+                messages.warning(
+                    request,
+                    "Rendering these quotations is taking too long for the browser. They keep rendering "
+                    "in the background, so try again in a minute, or use the export_quotations management command.",
+                )
+                return render(request, 'core/quotation_batch.html', {'form': form})
+            output = tempfile.TemporaryFile()
+            if data['output'] == 'pdf':
+                pdfs.write_merged_pdf(batch, output)
+                filename, content_type = 'quotations.pdf', 'application/pdf'
+            else:
+                pdfs.write_zip(batch, output)
+                filename, content_type = 'quotations.zip', 'application/zip'
+            output.seek(0)
+            return FileResponse(output, as_attachment=True, filename=filename, content_type=content_type)
+
+    return render(request, 'core/quotation_batch.html', {'form': form})
 
 
 @login_required
 def generate_car_owner_pdf(request, car_id):
-    car = get_object_or_404(Car, id=car_id)
-
-    header_path = os.path.join(settings.STATICFILES_DIRS[0], 'reports', 'images', 'header.png')
-    header_uri = Path(header_path).as_uri()
-
-    context = {
-        'car': car,
-        'owner': car.owner,
-        'header_image_path': header_uri,
-    }
-
-    html_string = render_to_string('reports/car_owner_pdf.html', context)
-    html = HTML(string=html_string, base_url=request.build_absolute_uri('/'))
-    pdf_file = html.write_pdf()
-
-    response = HttpResponse(pdf_file, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="car_details_{car.plate_number}.pdf"'
-    return response
-
+    car = get_object_or_404(Car.objects.select_related('owner'), id=car_id)
+    return _pdf_response(request, pdfs.car_owner_pdf(car))
 
 
 from django.contrib.auth.decorators import permission_required
 from django.shortcuts import render, redirect
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 from .models import RepairJob
 
 @permission_required('core.can_manage_repair_dashboard', raise_exception=True)
 def repair_dashboard(request):
-    jobs = RepairJob.objects.exclude(lpo_confirmed=True, sign_confirmed=True)
+    jobs = RepairJob.objects.exclude(lpo_confirmed=True, sign_confirmed=True).select_related('car')
 
     if request.method == 'POST':
-        for job in jobs:
-            job.lpo_confirmed = f'lpo_{job.id}' in request.POST
+        # Only the rows that were on the submitted page; a job that appeared
+        # since then has no checkboxes in this form and must not be reset.
+        posted_ids = [job_id for job_id in request.POST.getlist('job_ids') if job_id.isdigit()]
 
+        changed = []
+        for job in jobs.filter(id__in=posted_ids):
+            before = (job.lpo_confirmed, job.sign_confirmed, job.deal)
+
+            job.lpo_confirmed = f'lpo_{job.id}' in request.POST
             job.sign_confirmed = f'sign_{job.id}' in request.POST
 
             deal_val = request.POST.get(f'deal_{job.id}')
             if deal_val:
                 try:
                     job.deal = Decimal(deal_val)
-                except:
-                    pass  
+                except InvalidOperation:
+                    pass
 
-            job.save()
+            if (job.lpo_confirmed, job.sign_confirmed, job.deal) != before:
+                job.detail_version = F('detail_version') + 1
+                changed.append(job)
+
+        if changed:
+            with transaction.atomic():
+                RepairJob.objects.bulk_update(changed, ['lpo_confirmed', 'sign_confirmed', 'deal', 'detail_version'])
+                Income.objects.sync_for_jobs([job for job in changed if job.deal_changed])
 
         return redirect('core:repair_dashboard')
 
     return render(request, 'core/repair_dashboard.html', {'jobs': jobs})
+
+
+@staff_member_required
+def profiling_view(request):
+    """آخرین درخواست‌های ثبت شده توسط ProfilingMiddleware، به تفکیک نام URL."""
+    profiles = profiling.recent()
+    context = {
+        'enabled': settings.PROFILING_ENABLED,
+        'summary': profiling.summary(profiles),
+        'flagged': [profile for profile in profiles if profile.repeated][:20],
+        'recent': profiles[:50],
+        'threshold': settings.PROFILING_REPEAT_THRESHOLD,
+    }
+    return render(request, 'core/profiling.html', context)
@@ -1,5 +1,6 @@
 from django import forms
 from core.models import RepairJob 
+from .turnaround import GROUPINGS
 
 class DateRangeFilterForm(forms.Form):
     STATUS_CHOICES = [('', 'All Statuses')] + RepairJob.Stage.choices
@@ -33,4 +34,22 @@ class DateRangeFilterForm(forms.Form):
         required=False,
         label="Signature Confirmed",
         widget=forms.Select(attrs={'class': 'form-select'})
-    )
\ No newline at end of file
+    )
+
+class TurnaroundFilterForm(forms.Form):
+    group_by = forms.ChoiceField(
+        choices=list(GROUPINGS.items()),
+        required=False,
+        label="Group By",
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    start_month = forms.DateField(
+        required=False,
+        input_formats=['%Y-%m'],
+        widget=forms.DateInput(format='%Y-%m', attrs={'type': 'month', 'class': 'form-control'})
+    )
+    end_month = forms.DateField(
+        required=False,
+        input_formats=['%Y-%m'],
+        widget=forms.DateInput(format='%Y-%m', attrs={'type': 'month', 'class': 'form-control'})
+    )
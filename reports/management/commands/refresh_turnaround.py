@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from reports import turnaround
+
+
+class Command(BaseCommand):
+    help = (
+        "Refreshes the JobTurnaround table behind the turnaround report. By default only "
+        "open jobs, jobs never computed and jobs archived since their last refresh are "
+        "revisited; run it periodically, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Recompute every job, e.g. after editing car data.")
+        parser.add_argument('--batch-size', type=int, default=turnaround.DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        written = turnaround.refresh(full=options['full'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed {written} job turnarounds in {time.perf_counter() - start:.1f}s."
+        ))
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('core', '0015_car_is_archived'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobTurnaround',
+            fields=[
+                ('repair_job', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='turnaround', serialize=False, to='core.repairjob', verbose_name='Repair Job')),
+                ('brand', models.CharField(max_length=50, verbose_name='Brand')),
+                ('estimated_cost', models.CharField(max_length=10, verbose_name='Estimated Cost Level')),
+                ('month', models.DateField(verbose_name='Registration Month')),
+                ('expert_wait', models.DurationField(blank=True, null=True, verbose_name='Registration → Expert')),
+                ('approval_wait', models.DurationField(blank=True, null=True, verbose_name='Expert → Approval')),
+                ('start_wait', models.DurationField(blank=True, null=True, verbose_name='Approval → Work Start')),
+                ('parts_wait', models.DurationField(blank=True, null=True, verbose_name='Parts Pending → Work Start')),
+                ('repair', models.DurationField(blank=True, null=True, verbose_name='Work Start → Finish')),
+                ('exit_wait', models.DurationField(blank=True, null=True, verbose_name='Finish → Exit')),
+                ('total', models.DurationField(blank=True, null=True, verbose_name='Registration → Exit')),
+                ('refreshed_at', models.DateTimeField(auto_now=True, verbose_name='Refreshed At')),
+            ],
+            options={
+                'verbose_name': 'Job Turnaround',
+                'verbose_name_plural': 'Job Turnarounds',
+                'indexes': [models.Index(fields=['month'], name='reports_turnaround_month_idx')],
+            },
+        ),
+    ]
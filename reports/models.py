@@ -1,3 +1,37 @@
 from django.db import models
 
-# Create your models here.
+from core.models import RepairJob
+
+
+class JobTurnaround(models.Model):
+    """
+    مدت زمان هر مرحله از یک کار تعمیر؛ جدول محاسبه شده‌ای که refresh_turnaround پر می‌کند.
+    Brand, estimate level and month are copied from the car so the percentile
+    report groups without joining back to the jobs.
+    """
+    repair_job = models.OneToOneField(
+        RepairJob, on_delete=models.CASCADE, primary_key=True, related_name='turnaround', verbose_name="Repair Job",
+    )
+    brand = models.CharField(max_length=50, verbose_name="Brand")
+    estimated_cost = models.CharField(max_length=10, verbose_name="Estimated Cost Level")
+    month = models.DateField(verbose_name="Registration Month")
+
+    expert_wait = models.DurationField(null=True, blank=True, verbose_name="Registration → Expert")
+    approval_wait = models.DurationField(null=True, blank=True, verbose_name="Expert → Approval")
+    start_wait = models.DurationField(null=True, blank=True, verbose_name="Approval → Work Start")
+    parts_wait = models.DurationField(null=True, blank=True, verbose_name="Parts Pending → Work Start")
+    repair = models.DurationField(null=True, blank=True, verbose_name="Work Start → Finish")
+    exit_wait = models.DurationField(null=True, blank=True, verbose_name="Finish → Exit")
+    total = models.DurationField(null=True, blank=True, verbose_name="Registration → Exit")
+
+    refreshed_at = models.DateTimeField(auto_now=True, verbose_name="Refreshed At")
+
+    class Meta:
+        verbose_name = "Job Turnaround"
+        verbose_name_plural = "Job Turnarounds"
+        indexes = [
+            models.Index(fields=['month'], name='reports_turnaround_month_idx'),
+        ]
+
+    def __str__(self):
+        return f"Turnaround for Job #{self.repair_job_id}"
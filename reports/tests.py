@@ -1,3 +1,175 @@
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounting.models import Employee, Expense, SalarySlip
+from core.models import Car, RepairJob
+from . import turnaround
+from .models import JobTurnaround
+
+
+class TurnaroundRefreshTests(TestCase):
+    """Stage durations are materialized once and only open jobs are revisited."""
+
+    def setUp(self):
+        self.registered = timezone.now() - timedelta(days=30)
+        self.car = Car.objects.create(plate_number='T-1', year=2020, brand='TOYOTA', registered_at=self.registered)
+
+    def make_job(self, **stages):
+        moments = {name: self.registered + timedelta(days=days) for name, days in stages.items()}
+        return RepairJob.objects.create(car=self.car, **moments)
+
+    def test_durations_follow_the_job_timestamps(self):
+        job = self.make_job(expert_inspected_at=1, approved_at=3, work_started_at=4, work_finished_at=10, exited_at=12)
+        self.assertEqual(turnaround.refresh(), 1)
+
+        row = JobTurnaround.objects.get(repair_job=job)
+        self.assertEqual(row.brand, 'TOYOTA')
+        self.assertEqual(row.month, timezone.localtime(self.registered).date().replace(day=1))
+        self.assertEqual(row.expert_wait, timedelta(days=1))
+        self.assertEqual(row.approval_wait, timedelta(days=2))
+        self.assertEqual(row.repair, timedelta(days=6))
+        self.assertEqual(row.total, timedelta(days=12))
+        self.assertIsNone(row.parts_wait)
+
+    def test_incremental_refresh_skips_archived_jobs(self):
+        open_job = self.make_job(expert_inspected_at=1)
+        done_job = self.make_job(expert_inspected_at=2, exited_at=5)
+        done_job.status = RepairJob.Stage.ARCHIVED
+        done_job.save()
+        turnaround.refresh()
+
+        RepairJob.objects.filter(id=open_job.id).update(approved_at=self.registered + timedelta(days=4))
+        self.assertEqual(turnaround.refresh(), 1)
+        self.assertEqual(JobTurnaround.objects.get(repair_job=open_job).approval_wait, timedelta(days=3))
+        self.assertEqual(turnaround.refresh(full=True), 2)
+
+    def test_job_refreshed_while_open_is_revisited_once_archived(self):
+        job = self.make_job(expert_inspected_at=1, work_finished_at=10)
+        self.assertEqual(turnaround.refresh(), 1)
+        self.assertIsNone(JobTurnaround.objects.get(repair_job=job).total)
+
+        # As confirm_lpo does: status and exit time in one save.
+        self.car.brand = 'NISSAN'
+        self.car.save()
+        job.status = RepairJob.Stage.ARCHIVED
+        job.exited_at = timezone.now()
+        job.save()
+        self.assertEqual(turnaround.refresh(), 1)
+        row = JobTurnaround.objects.get(repair_job=job)
+        self.assertEqual(row.brand, 'NISSAN')
+        self.assertEqual(row.exit_wait, job.exited_at - (self.registered + timedelta(days=10)))
+        self.assertEqual(row.total, job.exited_at - self.registered)
+        self.assertEqual(turnaround.refresh(), 0)
+
+
+class FinancialReportTests(TestCase):
+    """VAT and totals are computed in SQL, per row and for the whole report."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user(username='accountant'))
+        for i, deal in enumerate(['1000.00', '333.40', '20.20', None]):
+            car = Car.objects.create(plate_number=f'F-{i}', year=2020)
+            RepairJob.objects.create(car=car, deal=Decimal(deal) if deal else None)
+
+    def test_totals_and_rows(self):
+        response = self.client.get(reverse('reports:financial_report'), {'sort': '-total'})
+        self.assertEqual(response.context['grand_total_deal'], Decimal('1353.60'))
+        self.assertEqual(response.context['grand_total_vat'], Decimal('67.68'))
+        self.assertEqual(response.context['grand_total_final'], Decimal('1421.28'))
+
+        rows = {job.car.plate_number: (job.vat, job.total) for job in response.context['report_jobs']}
+        self.assertEqual(rows['F-0'], (Decimal('50.00'), Decimal('1050.00')))
+        self.assertEqual(rows['F-1'], (Decimal('16.67'), Decimal('350.07')))
+        self.assertEqual(rows['F-3'], (None, None))
+
+        # Where NULL totals sort depends on the database; the priced jobs come in order.
+        priced = [job.car.plate_number for job in response.context['report_jobs'] if job.total is not None]
+        self.assertEqual(priced, ['F-0', 'F-1', 'F-2'])
+        self.assertEqual(response.context['current_sort'], '-total')
+
+    def test_excel_export_runs(self):
+        response = self.client.get(reverse('reports:export_financial_excel'))
+        self.assertEqual(response.status_code, 200)
+        b''.join(response.streaming_content)
+
+
+class PayrollReportTests(TestCase):
+    """Personal expenses of every slip are loaded in one query, with the baseline period bounds."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user(username='payroll'))
+        self.period = (date(2025, 3, 1), date(2025, 3, 31))
+
+    def at(self, day, hour=0, minute=0):
+        return timezone.make_aware(datetime.combine(day, time(hour, minute)))
+
+    def add_employee(self, name):
+        employee = Employee.objects.create(full_name=name, base_salary=3000, hire_date='2024-01-01')
+        slip = SalarySlip.objects.create(
+            employee=employee, pay_period_start=self.period[0], pay_period_end=self.period[1],
+        )
+        return employee, slip
+
+    def expense(self, employee, description, moment):
+        Expense.objects.create(
+            employee=employee, expense_type='personal', personal_type='advance',
+            description=description, amount=-10, transaction_date=moment,
+        )
+
+    def report_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(reverse('reports:payroll_report')).status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_slips(self):
+        employee, _ = self.add_employee('Only')
+        self.expense(employee, 'Advance', self.at(date(2025, 3, 10)))
+        one = self.report_queries()
+
+        for i in range(10):
+            employee, _ = self.add_employee(f'Many {i}')
+            self.expense(employee, 'Advance', self.at(date(2025, 3, 10)))
+        self.assertEqual(self.report_queries(), one)
+
+    def test_period_bounds_match_the_date_range_lookup(self):
+        employee, slip = self.add_employee('Edges')
+        self.expense(employee, 'day before', self.at(date(2025, 2, 28), 23, 59))
+        self.expense(employee, 'first midnight', self.at(self.period[0]))
+        self.expense(employee, 'last midnight', self.at(self.period[1]))
+        self.expense(employee, 'last morning', self.at(self.period[1], 9))
+
+        response = self.client.get(reverse('reports:payroll_report'))
+        [slip] = [row for row in response.context['salary_slips'] if row.id == slip.id]
+        self.assertEqual(
+            sorted(expense.description for expense in slip.personal_expenses),
+            ['first midnight', 'last midnight'],
+        )
+
+
+@skipUnless(connection.vendor == 'postgresql', "percentile_cont is PostgreSQL-only")
+class TurnaroundReportTests(TestCase):
+
+    def test_percentiles_by_brand(self):
+        registered = timezone.now() - timedelta(days=60)
+        car = Car.objects.create(plate_number='T-2', year=2020, brand='KIA', registered_at=registered)
+        for days in (1, 2, 3, 4, 5):
+            RepairJob.objects.create(car=car, expert_inspected_at=registered + timedelta(days=days))
+        turnaround.refresh()
+
+        [row] = turnaround.percentile_report('brand')
+        self.assertEqual((row['group'], row['jobs']), ('KIA', 5))
+        self.assertEqual(row['stages'][0], [3.0, 4.6])
 
-# Create your tests here.
+        self.client.force_login(User.objects.create_user(username='viewer'))
+        response = self.client.get(
+            reverse('reports:turnaround_report'), {'group_by': 'month', 'start_month': date.today().strftime('%Y-%m')},
+        )
+        self.assertEqual(response.status_code, 200)
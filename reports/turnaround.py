@@ -0,0 +1,136 @@
+"""
+محاسبه مدت مراحل تعمیر و صدک‌های آن برای گزارش زمان چرخه (turnaround).
+
+Stage durations are materialized in ``JobTurnaround`` by :func:`refresh`, so
+the report aggregates one narrow table instead of the job history.
+Archived jobs no longer change; an incremental refresh only revisits jobs
+that are still open, have never been computed, or were last computed before
+they exited (a job archived since the previous refresh).
+"""
+from datetime import date
+
+from django.db.models import Aggregate, Count, DurationField, F, Q
+from django.utils import timezone
+
+from core.models import RepairJob
+from .models import JobTurnaround
+
+# (field, label, start, end) — start/end are RepairJob timestamps (lookups allowed).
+STAGES = [
+    ('expert_wait', "Registration → Expert", 'car__registered_at', 'expert_inspected_at'),
+    ('approval_wait', "Expert → Approval", 'expert_inspected_at', 'approved_at'),
+    ('start_wait', "Approval → Work Start", 'approved_at', 'work_started_at'),
+    ('parts_wait', "Parts Pending → Work Start", 'parts_pending_at', 'work_started_at'),
+    ('repair', "Work Start → Finish", 'work_started_at', 'work_finished_at'),
+    ('exit_wait', "Finish → Exit", 'work_finished_at', 'exited_at'),
+    ('total', "Registration → Exit", 'car__registered_at', 'exited_at'),
+]
+
+# The RepairJob timestamps the stages read; registration comes from the car.
+JOB_TIMESTAMPS = sorted({name for _, _, start, end in STAGES for name in (start, end)} - {'car__registered_at'})
+
+GROUPINGS = {
+    'brand': "Brand",
+    'estimated_cost': "Estimate Level",
+    'month': "Month",
+}
+
+PERCENTILES = (0.5, 0.9)
+
+DEFAULT_BATCH_SIZE = 2000
+
+
+class Percentile(Aggregate):
+    """percentile_cont در PostgreSQL؛ روی بازه‌های زمانی (interval) هم کار می‌کند."""
+    function = 'PERCENTILE_CONT'
+    name = 'Percentile'
+    template = '%(function)s(%(fraction)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+
+    def __init__(self, expression, fraction, **extra):
+        super().__init__(expression, fraction=float(fraction), **extra)
+
+
+def _duration(start, end):
+    if start is None or end is None or end < start:
+        return None
+    return end - start
+
+
+def build_row(job):
+    """A ``JobTurnaround`` for ``job`` (with its car loaded), not yet saved."""
+    moments = {name: getattr(job, name) for name in JOB_TIMESTAMPS}
+    moments['car__registered_at'] = job.car.registered_at
+    registered = timezone.localtime(job.car.registered_at)
+    return JobTurnaround(
+        repair_job_id=job.id,
+        brand=job.car.brand,
+        estimated_cost=job.car.estimated_cost,
+        month=date(registered.year, registered.month, 1),
+        **{field: _duration(moments[start], moments[end]) for field, _, start, end in STAGES},
+    )
+
+
+def stale_jobs(full=False):
+    """کارهایی که ردیف turnaround آن‌ها باید (دوباره) محاسبه شود."""
+    jobs = RepairJob.objects.all()
+    if not full:
+        jobs = jobs.filter(
+            Q(turnaround__isnull=True)
+            | ~Q(status=RepairJob.Stage.ARCHIVED)
+            # ردیفی که پیش از خروج محاسبه شده، مدت خروج و کل را ندارد.
+            | Q(turnaround__refreshed_at__lt=F('exited_at'))
+        )
+    return jobs
+
+
+def refresh(full=False, batch_size=DEFAULT_BATCH_SIZE):
+    """Upserts ``JobTurnaround`` rows for stale jobs in id order and returns how many were written."""
+    jobs = stale_jobs(full).select_related('car').only(
+        'id', *JOB_TIMESTAMPS, 'car__brand', 'car__estimated_cost', 'car__registered_at',
+    ).order_by('id')
+    update_fields = ['brand', 'estimated_cost', 'month', 'refreshed_at'] + [stage[0] for stage in STAGES]
+
+    written, last_id = 0, 0
+    while True:
+        batch = list(jobs.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return written
+        last_id = batch[-1].id
+        JobTurnaround.objects.bulk_create(
+            [build_row(job) for job in batch],
+            update_conflicts=True, unique_fields=['repair_job'], update_fields=update_fields,
+        )
+        written += len(batch)
+
+
+def percentile_report(group_by, start_month=None, end_month=None):
+    """
+    One row per group with the job count and, for every stage, its median
+    and 90th percentile in days. Runs a single aggregate over JobTurnaround.
+    """
+    rows = JobTurnaround.objects.all()
+    if start_month:
+        rows = rows.filter(month__gte=start_month.replace(day=1))
+    if end_month:
+        rows = rows.filter(month__lte=end_month.replace(day=1))
+
+    aggregates = {'jobs': Count('pk')}
+    for field, _, _, _ in STAGES:
+        for fraction in PERCENTILES:
+            aggregates[f'{field}_p{int(fraction * 100)}'] = Percentile(field, fraction, output_field=DurationField())
+
+    report = []
+    for row in rows.values(group_by).annotate(**aggregates).order_by(group_by):
+        report.append({
+            'group': row[group_by],
+            'jobs': row['jobs'],
+            'stages': [
+                [_days(row[f'{field}_p{int(fraction * 100)}']) for fraction in PERCENTILES]
+                for field, _, _, _ in STAGES
+            ],
+        })
+    return report
+
+
+def _days(duration):
+    return round(duration.total_seconds() / 86400, 1) if duration is not None else None
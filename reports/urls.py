@@ -14,6 +14,7 @@ urlpatterns = [
     path('slip/<int:slip_id>/adjust/', views.add_salary_adjustment_view, name='add_adjustment'),
     path('slip/<int:slip_id>/close/', views.close_salary_slip_view, name='close_slip'),
     path('profit-report/', views.profit_report_view, name='profit_report'),
+    path('turnaround/', views.turnaround_report_view, name='turnaround_report'),
 
 
 ]
\ No newline at end of file
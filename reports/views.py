@@ -2,41 +2,37 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from core.models import RepairJob
 from decimal import Decimal
-from .forms import DateRangeFilterForm
-import openpyxl
+from collections import defaultdict
+from datetime import datetime, time
+from .forms import DateRangeFilterForm, TurnaroundFilterForm
+from . import turnaround
 from django.db.models import Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.contrib import messages
 from django.http import HttpResponse
-from openpyxl.utils import get_column_letter
+from core.exports import xlsx_response, EXPORT_CHUNK_SIZE
+from core.pagination import keyset_page, offset_page
 from accounting.models import SalarySlip, Expense, Attendance, Employee, Income
+from accounting import ledger
 from accounting.forms import AttendanceForm, SalarySlipForm, SalaryAdjustmentForm, CloseSlipForm
-@login_required
-def operational_report_view(request):
-    sortable_fields = [
-        ('car__brand', 'Car'),
-        ('car__model', 'Model'),
-        ('car__plate_number', 'Plate'),
-        ('status', 'Status'),
-        ('car__registered_at', 'Entry Date'),
-        ('expert_inspected_at', 'Expert Visit'),
-        ('approved_at', 'Approve Date'),
-    ]
-    jobs = RepairJob.objects.select_related('car')
 
-    start = request.GET.get('start_date')
-    end = request.GET.get('end_date')
+
+def filter_operational_jobs(jobs, params):
+    """Applies the operational report filters and sort; shared with its Excel export."""
+    start = params.get('start_date')
+    end = params.get('end_date')
     if start:
         jobs = jobs.filter(car__registered_at__gte=start)
     if end:
         jobs = jobs.filter(car__registered_at__lte=end)
 
-    if request.GET.get('sign'):
+    if params.get('sign'):
         jobs = jobs.filter(sign_confirmed=True)
-    if request.GET.get('lpo'):
+    if params.get('lpo'):
         jobs = jobs.filter(lpo_confirmed=True)
 
-    sort_field = request.GET.get('sort', 'car__registered_at')
+    sort_field = params.get('sort', 'car__registered_at')
     allowed_fields = [
         'car__brand', 'car__model', 'car__plate_number',
         'status', 'car__registered_at', 'expert_inspected_at', 'approved_at',
@@ -45,34 +41,14 @@ def operational_report_view(request):
     ]
     if sort_field in allowed_fields:
         jobs = jobs.order_by(sort_field)
+    return jobs
 
-    context = {
-        'form': DateRangeFilterForm(request.GET or None),
-        'report_jobs': jobs,
-        'sortable_fields': sortable_fields,
-        'active_page': 'operational',
-
-    }
-    return render(request, 'reports/operational_report.html', context)
-
-
-@login_required
-def financial_report_view(request):
-    form = DateRangeFilterForm(request.GET or None)
-    jobs = RepairJob.objects.select_related('car').all()
-
-    columns = [
-    ('car__brand', 'Car'),
-    ('car__model', 'Model'),
-    ('car__plate_number', 'Plate'),
-    ('status', 'Status'),
-    ('approved_at', 'Approve Date'),
-    ('deal', 'Deal Amount'),
-    ('lpo_confirmed', 'LPO Confirmed'),
-    ('sign_confirmed', 'Sign Confirmed'),
-    ('vat', 'VAT (5%)'),
-    ('total', 'Total Amount'),]
 
+def filter_financial_jobs(jobs, form, sort_field):
+    """
+    Applies the financial report filters and sort; shared with its Excel export.
+    Returns the filtered queryset and the sort field actually used.
+    """
     if form.is_valid():
         start_date = form.cleaned_data.get('start_date')
         end_date = form.cleaned_data.get('end_date')
@@ -97,7 +73,6 @@ def financial_report_view(request):
         elif sign == 'no':
             jobs = jobs.filter(sign_confirmed=False)
 
-    sort_field = request.GET.get('sort', '-approved_at')  
     allowed_sorts = [
         'car__brand', '-car__brand',
         'car__model', '-car__model',
@@ -105,32 +80,70 @@ def financial_report_view(request):
         'status', '-status',
         'approved_at', '-approved_at',
         'deal', '-deal',
+        'vat', '-vat',
+        'total', '-total',
     ]
+    if sort_field not in allowed_sorts:
+        sort_field = '-approved_at'
+    return jobs.order_by(sort_field), sort_field
 
-    if sort_field in allowed_sorts:
-        jobs = jobs.order_by(sort_field)
+
+@login_required
+def operational_report_view(request):
+    sortable_fields = [
+        ('car__brand', 'Car'),
+        ('car__model', 'Model'),
+        ('car__plate_number', 'Plate'),
+        ('status', 'Status'),
+        ('car__registered_at', 'Entry Date'),
+        ('expert_inspected_at', 'Expert Visit'),
+        ('approved_at', 'Approve Date'),
+    ]
+    jobs = filter_operational_jobs(RepairJob.objects.select_related('car'), request.GET)
+    if request.GET.get('sort', 'car__registered_at') == 'car__registered_at':
+        page = keyset_page(request, jobs, ('car__registered_at', 'id'))
     else:
-        jobs = jobs.order_by('-approved_at')
+        page = offset_page(request, jobs)
+
+    context = {
+        'form': DateRangeFilterForm(request.GET or None),
+        'report_jobs': page,
+        'sortable_fields': sortable_fields,
+        'active_page': 'operational',
 
-    jobs_with_deal = [job for job in jobs if job.deal]
-    grand_total_deal = sum(job.deal for job in jobs_with_deal)
-    grand_total_vat = grand_total_deal * Decimal('0.05')
-    grand_total_final = grand_total_deal + grand_total_vat
+    }
+    return render(request, 'reports/operational_report.html', context)
 
-    for job in jobs:
-        if job.deal:
-            job.vat = job.deal * Decimal('0.05')
-            job.total = job.deal + job.vat
-        else:
-            job.vat = None
-            job.total = None
+
+@login_required
+def financial_report_view(request):
+    form = DateRangeFilterForm(request.GET or None)
+    jobs = RepairJob.objects.select_related('car').with_vat()
+
+    columns = [
+    ('car__brand', 'Car'),
+    ('car__model', 'Model'),
+    ('car__plate_number', 'Plate'),
+    ('status', 'Status'),
+    ('approved_at', 'Approve Date'),
+    ('deal', 'Deal Amount'),
+    ('lpo_confirmed', 'LPO Confirmed'),
+    ('sign_confirmed', 'Sign Confirmed'),
+    ('vat', 'VAT (5%)'),
+    ('total', 'Total Amount'),]
+
+    jobs, sort_field = filter_financial_jobs(jobs, form, request.GET.get('sort', '-approved_at'))
+
+    totals = jobs.aggregate(
+        grand_total_deal=Coalesce(Sum('deal'), Decimal('0.00')),
+        grand_total_vat=Coalesce(Sum('vat'), Decimal('0.00')),
+        grand_total_final=Coalesce(Sum('total'), Decimal('0.00')),
+    )
 
     context = {
         'form': form,
-        'report_jobs': jobs,
-        'grand_total_deal': grand_total_deal,
-        'grand_total_vat': grand_total_vat,
-        'grand_total_final': grand_total_final,
+        'report_jobs': offset_page(request, jobs),
+        **totals,
         'active_page': 'financial',
         'current_sort': sort_field,
         'columns': columns,
@@ -141,62 +154,55 @@ def financial_report_view(request):
 
 @login_required
 def export_financial_report_excel(request):
-    jobs = RepairJob.objects.select_related('car').filter(deal__isnull=False).order_by('-approved_at')
-    
-    start_date = request.GET.get('start_date')
-    end_date = request.GET.get('end_date')
-    status = request.GET.get('status')
-    lpo = request.GET.get('lpo')
-    sign = request.GET.get('sign')
-
-    if start_date:
-        jobs = jobs.filter(approved_at__gte=start_date)
-    if end_date:
-        jobs = jobs.filter(approved_at__lte=end_date)
-    if status:
-        jobs = jobs.filter(status=status)
-    else:
+    form = DateRangeFilterForm(request.GET or None)
+    jobs, _ = filter_financial_jobs(RepairJob.objects.select_related('car').with_vat(), form, request.GET.get('sort', '-approved_at'))
+    jobs = jobs.filter(deal__isnull=False)
+    if not request.GET.get('status'):
         jobs = jobs.filter(status='archived')
-        
-    if lpo == 'yes':
-        jobs = jobs.filter(lpo_confirmed=True)
-    elif lpo == 'no':
-        jobs = jobs.filter(lpo_confirmed=False)
-        
-    if sign == 'yes':
-        jobs = jobs.filter(sign_confirmed=True)
-    elif sign == 'no':
-        jobs = jobs.filter(sign_confirmed=False)
-        
-    workbook = openpyxl.Workbook()
-    sheet = workbook.active
-    sheet.title = 'Operational Report'
 
     headers = ['Car Make', 'Model', 'Plate', 'Color', 'Status', 'Entry Date', 'Expert Visit', 'Approve Date']
-    sheet.append(headers)
-
-    for job in jobs:
-        row = [
-            job.car.brand, job.car.model, job.car.plate_number, job.car.color,
-            job.get_status_display(),
-            job.car.registered_at.strftime('%Y-%m-%d') if job.car.registered_at else '',
-            job.expert_inspected_at.strftime('%Y-%m-%d') if job.expert_inspected_at else '',
-            job.approved_at.strftime('%Y-%m-%d') if job.approved_at else '',
-        ]
-        sheet.append(row)
-    
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename="operational_report.xlsx"'
-    workbook.save(response)
-    return response
+    return xlsx_response('operational_report.xlsx', 'Operational Report', headers, _job_rows(jobs))
 
 from accounting.models import SalarySlip, Attendance 
 from .forms import DateRangeFilterForm
 
+
+def _period_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def attach_personal_expenses(slips):
+    """
+    Loads the personal expenses of all slips in one query and sets
+    ``slip.personal_expenses`` to the ones inside each slip's pay period.
+    """
+    for slip in slips:
+        slip.personal_expenses = []
+    if not slips:
+        return
+
+    expenses = Expense.objects.filter(
+        employee_id__in={slip.employee_id for slip in slips},
+        expense_type='personal',
+        transaction_date__gte=_period_start(min(slip.pay_period_start for slip in slips)),
+        transaction_date__lte=_period_start(max(slip.pay_period_end for slip in slips)),
+    )
+    by_employee = defaultdict(list)
+    for expense in expenses:
+        by_employee[expense.employee_id].append(expense)
+
+    for slip in slips:
+        start = _period_start(slip.pay_period_start)
+        end = _period_start(slip.pay_period_end)
+        slip.personal_expenses = [
+            expense for expense in by_employee[slip.employee_id]
+            if start <= expense.transaction_date <= end
+        ]
+
 @login_required
 def payroll_report_view(request):
     form = DateRangeFilterForm(request.GET or None)
-    slips = SalarySlip.objects.select_related('employee').all().order_by('-pay_period_end')
+    slips = SalarySlip.objects.select_related('employee').with_totals().order_by('-pay_period_end')
 
     if form.is_valid():
         start_date = form.cleaned_data.get('start_date')
@@ -205,18 +211,9 @@ def payroll_report_view(request):
             slips = slips.filter(pay_period_end__gte=start_date)
         if end_date:
             slips = slips.filter(pay_period_end__lte=end_date)
-            
-    for slip in slips:
-        slip.absence_count = Attendance.objects.filter(
-            employee=slip.employee,
-            date__range=(slip.pay_period_start, slip.pay_period_end)
-        ).count()
-        
-        slip.personal_expenses = Expense.objects.filter(
-            employee=slip.employee,
-            expense_type='personal',
-            transaction_date__range=(slip.pay_period_start, slip.pay_period_end)
-        )
+
+    slips = list(slips)
+    attach_personal_expenses(slips)
 
     total_cost_sum = sum(slip.cost for slip in slips)
 
@@ -230,55 +227,26 @@ def payroll_report_view(request):
 
 @login_required
 def export_operational_excel(request):
-    jobs = RepairJob.objects.select_related('car').all()
-
-    start_date = request.GET.get('start_date')
-    end_date = request.GET.get('end_date')
-    sign = request.GET.get('sign')
-    lpo = request.GET.get('lpo')
-    deal = request.GET.get('deal')
-
-    if start_date:
-        jobs = jobs.filter(approved_at__gte=start_date)
-    if end_date:
-        jobs = jobs.filter(approved_at__lte=end_date)
-
-    if sign == 'on':
-        jobs = jobs.filter(sign_confirmed=True)
-    if lpo == 'on':
-        jobs = jobs.filter(lpo_confirmed=True)
-    if deal == 'on':
+    jobs = filter_operational_jobs(RepairJob.objects.select_related('car'), request.GET)
+    if request.GET.get('deal'):
         jobs = jobs.exclude(deal__isnull=True)
 
-    workbook = openpyxl.Workbook()
-    sheet = workbook.active
-    sheet.title = 'Operational Report'
-
     headers = [
         'Car Brand', 'Model', 'Plate', 'Color',
         'Status', 'Entry Date', 'Expert Visit', 'Approve Date'
     ]
-    sheet.append(headers)
-
-    for job in jobs:
-        row = [
-            job.car.brand if job.car else '',
-            job.car.model if job.car else '',
-            job.car.plate_number if job.car else '',
-            job.car.color if job.car else '',
+    return xlsx_response('operational_report.xlsx', 'Operational Report', headers, _job_rows(jobs))
+
+
+def _job_rows(jobs):
+    for job in jobs.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [
+            job.car.brand, job.car.model, job.car.plate_number, job.car.color,
             job.get_status_display(),
-            job.car.registered_at.strftime('%Y-%m-%d') if job.car and job.car.registered_at else '',
+            job.car.registered_at.strftime('%Y-%m-%d') if job.car.registered_at else '',
             job.expert_inspected_at.strftime('%Y-%m-%d') if job.expert_inspected_at else '',
             job.approved_at.strftime('%Y-%m-%d') if job.approved_at else '',
         ]
-        sheet.append(row)
-
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename="operational_report.xlsx"'
-    workbook.save(response)
-    return response
 
 def payroll_dashboard_view(request):
     if request.method == 'POST':
@@ -296,7 +264,7 @@ def payroll_dashboard_view(request):
             if salary_slip_form.is_valid():
                 slip = salary_slip_form.save(commit=False)
                 
-                last_slip = SalarySlip.objects.filter(employee=slip.employee).order_by('-pay_period_end').first()
+                last_slip = SalarySlip.objects.with_totals().filter(employee=slip.employee).order_by('-pay_period_end').first()
                 if last_slip:
                     slip.remaining_before = last_slip.rest
                 
@@ -309,7 +277,7 @@ def payroll_dashboard_view(request):
     attendance_form = AttendanceForm()
     salary_slip_form = SalarySlipForm()
     recent_absences = Attendance.objects.all()[:10]  
-    salary_slips = SalarySlip.objects.select_related('employee').all()
+    salary_slips = SalarySlip.objects.select_related('employee').with_totals()
 
     context = {
         'attendance_form': attendance_form,
@@ -326,7 +294,7 @@ def employee_payroll_detail_view(request, employee_id):
     Displays the detailed payroll page for a single employee.
     """
     employee = get_object_or_404(Employee, id=employee_id)
-    slips = SalarySlip.objects.filter(employee=employee).order_by('-pay_period_start')
+    slips = SalarySlip.objects.select_related('employee').with_totals().filter(employee=employee).order_by('-pay_period_start')
     absences = Attendance.objects.filter(employee=employee)
     
     # فرم‌ها برای نمایش در صفحه
@@ -378,10 +346,11 @@ def close_salary_slip_view(request, slip_id):
     Closes the current salary slip and transfers the remaining balance.
     """
     if request.method == 'POST':
-        slip_to_close = get_object_or_404(SalarySlip, id=slip_id)
+        slip_to_close = get_object_or_404(SalarySlip.objects.select_related('employee').with_totals(), id=slip_id)
         form = CloseSlipForm(request.POST)
 
         if form.is_valid():
+            slip_to_close.freeze_totals()
             slip_to_close.is_closed = True
             slip_to_close.save()
 
@@ -410,15 +379,9 @@ def profit_report_view(request):
     from_date = request.GET.get('from')
     to_date = request.GET.get('to')
 
-    incomes = Income.objects.all()
-    expenses = Expense.objects.all()
-
-    if from_date:
-        incomes = incomes.filter(transaction_date__date__gte=from_date)
-        expenses = expenses.filter(transaction_date__date__gte=from_date)
-    if to_date:
-        incomes = incomes.filter(transaction_date__date__lte=to_date)
-        expenses = expenses.filter(transaction_date__date__lte=to_date)
+    dates = ledger.date_range(from_date, to_date)
+    incomes = Income.objects.filter(**dates)
+    expenses = Expense.objects.filter(**dates)
 
     total_income = incomes.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
     
@@ -431,10 +394,32 @@ def profit_report_view(request):
         'total_income': total_income,
         'total_expense': total_expense,
         'net_profit': net_profit,
-        'incomes': incomes.order_by('-transaction_date'),
-        'expenses': expenses.order_by('-transaction_date'),
+        'incomes': keyset_page(request, incomes, ('-transaction_date', '-id'), param='income_after'),
+        'expenses': keyset_page(request, expenses, ('-transaction_date', '-id'), param='expense_after'),
         'from_date': from_date, 
         'to_date': to_date,
         'active_page': 'profit-report',
     }
-    return render(request, 'reports/profit_report.html', context)
\ No newline at end of file
+    return render(request, 'reports/profit_report.html', context)
+
+
+@login_required
+def turnaround_report_view(request):
+    """صدک‌های مدت هر مرحله تعمیر، از جدول JobTurnaround (نه از کل تاریخچه کارها)."""
+    form = TurnaroundFilterForm(request.GET or None)
+    group_by, start_month, end_month = 'brand', None, None
+    if form.is_valid():
+        group_by = form.cleaned_data['group_by'] or group_by
+        start_month = form.cleaned_data['start_month']
+        end_month = form.cleaned_data['end_month']
+
+    context = {
+        'form': form,
+        'rows': turnaround.percentile_report(group_by, start_month, end_month),
+        'group_label': turnaround.GROUPINGS[group_by],
+        'group_by': group_by,
+        'stages': [label for _, label, _, _ in turnaround.STAGES],
+        'percentiles': [int(fraction * 100) for fraction in turnaround.PERCENTILES],
+        'active_page': 'turnaround',
+    }
+    return render(request, 'reports/turnaround_report.html', context)